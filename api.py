@@ -0,0 +1,218 @@
+"""Headless HTTP API in front of the AgriBot engine.
+
+Uses only the standard library, so it runs without Streamlit:
+
+    python api.py [--host 127.0.0.1] [--port 8000] [--no-preload]
+
+Endpoints:
+    POST /ask     {"question": "...", "session_id": "optional"}
+    POST /batch   {"questions": ["...", ...], "session_id": "optional"}
+    GET  /health  liveness plus model load state
+    GET  /ready   200 once AI answers can be served (or in knowledge-base-only mode), else 503;
+                  with --no-preload the model loads on first use, so it is ready right away
+    GET  /metrics counters, gauges and stage latency histograms in the Prometheus text format
+"""
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import settings
+import telemetry
+from bot import SessionContext, get_bot, response_source
+from model_registry import IDLE, READY, UNAVAILABLE, get_registry
+from pdf_index import preload_index
+from vector_index import preload_vector_index
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 1 << 20
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def session_id_of(payload):
+    """The request's optional session_id, which must be a non-empty string when given"""
+    session_id = payload.get("session_id")
+    if session_id is not None and (not isinstance(session_id, str) or not session_id.strip()):
+        raise ApiError(400, "session_id must be a non-empty string")
+    return session_id
+
+
+class SessionStore:
+    """Session context per session_id, least recently used evicted first"""
+
+    def __init__(self, max_sessions=settings.API_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        if not session_id:
+            return SessionContext()
+        with self._lock:
+            session = self._sessions.pop(session_id, None) or SessionContext()
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+
+class AgriBotService:
+    """Request handling independent of the HTTP layer"""
+
+    def __init__(self, max_batch=settings.API_MAX_BATCH, lazy_load=False):
+        self.max_batch = max_batch
+        # With lazy_load the model waits for the first AI-bound question instead of a preload
+        self.lazy_load = lazy_load
+        self.sessions = SessionStore()
+        self.registry = get_registry()
+        self.bot = get_bot()
+        # Batch questions run concurrently so LLM-bound ones share the worker's batches
+        self.pool = ThreadPoolExecutor(max_workers=max(2, settings.BATCH_MAX_SIZE * 2),
+                                       thread_name_prefix="agribot-api")
+
+    def answer(self, question, session=None):
+        if not isinstance(question, str) or not question.strip():
+            raise ApiError(400, "question must be a non-empty string")
+        session = session if session is not None else SessionContext()
+        started = time.perf_counter()
+        response = self.bot.process_message(question, session)
+        trace = session.last_trace
+        return {
+            "question": question,
+            "answer": response,
+            "source": response_source(response),
+            "intent": trace.attributes["intent"],
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "request_id": trace.request_id,
+            "timings_ms": trace.summary(),
+        }
+
+    def ask(self, payload):
+        return self.answer(payload.get("question"), self.sessions.get(session_id_of(payload)))
+
+    def batch(self, payload):
+        session_id = session_id_of(payload)
+        questions = payload.get("questions")
+        if not isinstance(questions, list) or not questions:
+            raise ApiError(400, "questions must be a non-empty list")
+        if len(questions) > self.max_batch:
+            raise ApiError(413, f"at most {self.max_batch} questions per batch")
+        for question in questions:
+            if not isinstance(question, str) or not question.strip():
+                raise ApiError(400, "every question must be a non-empty string")
+
+        if session_id:
+            # One conversation: answer in order so follow-ups see earlier turns
+            session = self.sessions.get(session_id)
+            answers = [self.answer(question, session) for question in questions]
+        else:
+            answers = list(self.pool.map(self.answer, questions))
+        return {"answers": answers}
+
+    def health(self):
+        return {"status": "ok", "model": self.registry.status()}
+
+    def ready(self):
+        state = self.registry.state
+        ready = state in (READY, UNAVAILABLE) or (state == IDLE and self.lazy_load)
+        return ready, {"ready": ready, "model_state": state}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "AgriBotAPI/1.0"
+    service = None  # set by create_server
+
+    def _send(self, status, body, content_type="application/json; charset=utf-8"):
+        if isinstance(body, str):
+            data = body.encode("utf-8")
+        else:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "request body too large")
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, UnicodeDecodeError):
+            raise ApiError(400, "request body must be JSON") from None
+        if not isinstance(payload, dict):
+            raise ApiError(400, "request body must be a JSON object")
+        return payload
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, self.service.health())
+        elif self.path == "/ready":
+            ready, body = self.service.ready()
+            self._send(200 if ready else 503, body)
+        elif self.path == "/metrics":
+            self._send(200, telemetry.render_metrics(), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        routes = {"/ask": self.service.ask, "/batch": self.service.batch}
+        route = routes.get(self.path)
+        if route is None:
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            self._send(200, route(self._read_json()))
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"internal error: {e}"})
+
+    def log_message(self, format, *args):
+        # Keep request logs terse; the default writes every request to stderr
+        if settings.env_bool("AGRIBOT_API_ACCESS_LOG", False):
+            super().log_message(format, *args)
+
+
+def create_server(host=settings.API_HOST, port=settings.API_PORT, service=None):
+    """Build (but don't start) the HTTP server; port 0 picks a free port"""
+    handler = type("BoundApiHandler", (ApiHandler,), {"service": service or AgriBotService()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the AgriBot HTTP API")
+    parser.add_argument("--host", default=settings.API_HOST)
+    parser.add_argument("--port", type=int, default=settings.API_PORT)
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=True,
+                        help="load the AI model and the document indexes in the background at startup (default); with "
+                             "--no-preload they load on first use, the document index is not rebuilt, and /ready "
+                             "does not wait for the model")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, AgriBotService(lazy_load=not args.preload))
+    if args.preload:
+        preload_index()
+        preload_vector_index()
+        if get_registry().state == IDLE:
+            threading.Thread(target=get_registry().load, name="agribot-preload", daemon=True).start()
+    print(f"🌾 AgriBot API listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
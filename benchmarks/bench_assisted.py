@@ -0,0 +1,147 @@
+"""Assisted decoding: draft acceptance rate and tokens/sec against plain decoding.
+
+    python benchmarks/bench_assisted.py --draft <model id> [--profile auto] [--draft-tokens 5]
+                                        [--tokens 128] [--json out.json]
+
+Each agronomy prompt is rendered through the real prompt templates and
+decoded greedily twice through ``InferenceWorker``, the path chat answers
+take, once plainly and once with the draft model, so the two replies must be
+identical; any difference is reported. The acceptance
+rate is estimated from forward passes: every verification pass of the main
+model yields its accepted draft tokens plus one of its own, and every draft
+forward pass proposes one token. Needs torch, transformers and both models.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import settings  # noqa: E402
+from prompts import EXPERT_ANSWER, USAGE_GUIDE  # noqa: E402
+
+# (crop or None, question): usage guides and general expert answers
+PROMPTS = [
+    ("potato", "how to store potato for months after harvest"),
+    ("tomato", "how to grow tomato in raised beds during the rainy season"),
+    ("wheat", "how to plan irrigation for wheat on sandy loam"),
+    (None, "How do I control aphids on wheat without chemicals?"),
+    (None, "What is the best irrigation schedule for potato in sandy soil?"),
+    (None, "what should a smallholder think about before switching to drip irrigation"),
+    (None, "How can I improve clay soil before planting tomato?"),
+]
+
+
+def render(crop, question):
+    if crop:
+        return USAGE_GUIDE.render(message=question, crop=crop, context="", history="")
+    return EXPERT_ANSWER.render(message=question, context="", history="")
+
+
+class ForwardCounter:
+    """Counts forward passes of a module"""
+
+    def __init__(self, module):
+        self.calls = 0
+        self.handle = module.register_forward_hook(self._hook)
+
+    def _hook(self, module, args, output):
+        self.calls += 1
+
+    def reset(self):
+        self.calls = 0
+
+
+def decode(worker, prompt, max_new_tokens):
+    """Reply text, tokens generated and seconds for one greedy request through the worker"""
+    tokens = worker.tokens_generated
+    started = time.perf_counter()
+    reply = worker.generate(prompt, max_new_tokens, {"do_sample": False})
+    return reply, worker.tokens_generated - tokens, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--draft", default=settings.DRAFT_MODEL_ID, help="draft model id or local path")
+    parser.add_argument("--profile", default=settings.MODEL_PROFILE)
+    parser.add_argument("--threads", type=int, default=settings.TORCH_THREADS)
+    parser.add_argument("--draft-tokens", type=int, default=settings.DRAFT_TOKENS,
+                        help="tokens the draft proposes per verification pass")
+    parser.add_argument("--tokens", type=int, default=128, help="max_new_tokens per prompt (the worker caps it at AGRIBOT_MAX_NEW_TOKENS)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    if not args.draft:
+        parser.error("pass --draft or set AGRIBOT_DRAFT_MODEL")
+
+    settings.DRAFT_TOKENS = args.draft_tokens
+    from inference_worker import InferenceWorker
+    from model_registry import READY, ModelRegistry
+
+    registry = ModelRegistry(profile=args.profile, threads=args.threads, draft_model_id=args.draft, assisted="on")
+    if registry.load() != READY:
+        sys.exit(f"❌ Could not load {registry.model_id}: {registry.error}")
+    if registry.draft_model is None:
+        sys.exit(f"❌ Could not load the draft model {args.draft}")
+    main_passes = ForwardCounter(registry.model)
+    draft_passes = ForwardCounter(registry.draft_model)
+    plain_worker = InferenceWorker(registry, max_batch_size=1, assisted=False)
+    assisted_worker = InferenceWorker(registry, max_batch_size=1)
+
+    # Warm both models so the first prompt doesn't pay for lazy initialisation
+    decode(assisted_worker, render(*PROMPTS[0]), 8)
+
+    rows = []
+    print(f"{'prompt':48} {'plain tok/s':>11} {'assisted':>9} {'speedup':>8} {'accepted':>9}  same")
+    for crop, question in PROMPTS:
+        prompt = render(crop, question)
+        plain, plain_tokens, plain_seconds = decode(plain_worker, prompt, args.tokens)
+        main_passes.reset()
+        draft_passes.reset()
+        assisted, assisted_tokens, assisted_seconds = decode(assisted_worker, prompt, args.tokens)
+        accepted = max(0, assisted_tokens - main_passes.calls)
+        row = {
+            "prompt": question,
+            "tokens": assisted_tokens,
+            "plain_tokens_per_second": plain_tokens / plain_seconds,
+            "assisted_tokens_per_second": assisted_tokens / assisted_seconds,
+            "verify_passes": main_passes.calls,
+            "drafted": draft_passes.calls,
+            "acceptance_rate": accepted / draft_passes.calls if draft_passes.calls else 0.0,
+            "identical": plain == assisted,
+        }
+        rows.append(row)
+        print(f"{question[:48]:48} {row['plain_tokens_per_second']:>11.2f} "
+              f"{row['assisted_tokens_per_second']:>9.2f} "
+              f"{row['assisted_tokens_per_second'] / row['plain_tokens_per_second']:>7.2f}x "
+              f"{row['acceptance_rate']:>8.0%}  {'yes' if row['identical'] else 'NO'}")
+
+    drafted = sum(row["drafted"] for row in rows)
+    summary = {
+        "model": registry.model_id,
+        "draft": args.draft,
+        "profile": registry.profile,
+        "threads": registry.threads,
+        "draft_tokens": args.draft_tokens,
+        "shares_vocab": registry.draft_shares_vocab,
+        "plain_tokens_per_second": sum(r["plain_tokens_per_second"] for r in rows) / len(rows),
+        "assisted_tokens_per_second": sum(r["assisted_tokens_per_second"] for r in rows) / len(rows),
+        "acceptance_rate": (sum(max(0, r["tokens"] - r["verify_passes"]) for r in rows) / drafted
+                            if drafted else 0.0),
+        "identical": sum(r["identical"] for r in rows),
+        "prompts": rows,
+    }
+    speedup = summary["assisted_tokens_per_second"] / summary["plain_tokens_per_second"]
+    print(f"\nmean: {summary['plain_tokens_per_second']:.2f} -> {summary['assisted_tokens_per_second']:.2f} "
+          f"tokens/s ({speedup:.2f}x), {summary['acceptance_rate']:.0%} of drafted tokens accepted, "
+          f"{summary['identical']}/{len(rows)} replies identical to plain greedy decoding")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
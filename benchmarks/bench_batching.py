@@ -0,0 +1,76 @@
+"""Tokens/sec of N concurrent generations: direct pipeline calls vs the batching worker.
+
+    python benchmarks/bench_batching.py [--clients 4] [--tokens 64]
+
+Needs the real phi-3 model (it is downloaded on first use).
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_worker import InferenceWorker  # noqa: E402
+from model_registry import READY, get_registry  # noqa: E402
+
+PROMPTS = [
+    "How do I control aphids on wheat without chemicals?",
+    "What is the best irrigation schedule for potato in sandy soil?",
+    "How can I improve clay soil before planting tomato?",
+    "When should rice be transplanted and at what spacing?",
+    "How do I recognise late blight on potato leaves?",
+    "What cover crops fix nitrogen after a corn harvest?",
+    "How often should I test soil pH on a vegetable farm?",
+    "How do I store harvested wheat to avoid pests?",
+]
+SAMPLING = {"do_sample": False}
+
+
+def wrap(question):
+    return f"<|user|>\nAs an agricultural expert, answer this farming question: {question}\n<|assistant|>\n"
+
+
+def run_clients(clients, call):
+    threads = [threading.Thread(target=call, args=(wrap(PROMPTS[i % len(PROMPTS)]),)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--wait-ms", type=int, default=25)
+    args = parser.parse_args()
+
+    registry = get_registry()
+    if registry.load() != READY:
+        sys.exit(f"Model not available: {registry.error}")
+    tokenizer = registry.tokenizer
+    generated = []
+    lock = threading.Lock()
+
+    def direct(prompt):
+        text = registry.generator(prompt, max_new_tokens=args.tokens, return_full_text=False,
+                                  pad_token_id=tokenizer.eos_token_id, **SAMPLING)[0]["generated_text"]
+        with lock:
+            generated.append(len(tokenizer(text)["input_ids"]))
+
+    elapsed = run_clients(args.clients, direct)
+    print(f"direct pipeline : {args.clients} clients, {elapsed:6.2f}s, {sum(generated) / elapsed:6.1f} tokens/s")
+
+    worker = InferenceWorker(registry, max_batch_size=args.clients, max_wait_ms=args.wait_ms).start()
+    elapsed = run_clients(args.clients, lambda prompt: worker.generate(prompt, args.tokens, SAMPLING))
+    metrics = worker.metrics()
+    print(f"batching worker : {args.clients} clients, {elapsed:6.2f}s, "
+          f"{metrics['tokens_generated'] / elapsed:6.1f} tokens/s, batch sizes {metrics['batch_sizes']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Compare the compiled term matcher with the old substring routing.
+
+    python benchmarks/bench_matcher.py [--repeat 2000] [--terms 5000]
+
+The legacy functions below are the routing code process_message used before
+the matcher: one ``.lower()`` and one ``any(word in message ...)`` chain per
+step. They are kept here only as the benchmark baseline.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import AgriBot  # noqa: E402
+from term_matcher import INTENT_KEYWORDS, TermMatcher  # noqa: E402
+
+QUERIES = [
+    "How do I grow tomato?",
+    "My crop is affected by cutworms.",
+    "What fertilizer should I use for corn?",
+    "What should I do if it rains heavily this week?",
+    "Tell me about rice cultivation",
+    "aphids are eating my wheat",
+    "How to prepare potato chips",
+    "My phone says blight is spreading because of rainy weather",
+    "Which disease causes rust on wheat leaves?",
+    "Give me a farming tip",
+    "What soil ph is best for potato?",
+    "leaves turning yellow and curling",
+]
+
+
+def legacy_identify_intent(message):
+    message = message.lower()
+    for intent, words in INTENT_KEYWORDS.items():
+        if any(word in message for word in words):
+            return intent
+    return "general"
+
+
+def legacy_route(bot, message):
+    """Intent plus the entity each legacy handler would have looked up"""
+    intent = legacy_identify_intent(message)
+    crop = next((c for c in bot.crops_info if c in message.lower()), None)
+    related = any(c in message.lower() for c in bot.crops_info)
+    pest = next((p for p in bot.pest_solutions if p in message.lower()), None)
+    disease = next((d for d in bot.disease_solutions if d in message.lower()), None)
+    weather = next((w for w in bot.weather_advice if w in message.lower()), None)
+    return intent, related, crop, pest, disease, weather
+
+
+def compiled_route(bot, message):
+    matches = bot.scan(message)
+    return (matches.intent, bool(matches.all("crop")), matches.first("crop"),
+            matches.first("pest"), matches.first("disease"), matches.first("weather"))
+
+
+def timed(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--terms", type=int, default=5000,
+                        help="synthetic table size for the scaling test")
+    args = parser.parse_args()
+
+    bot = AgriBot()
+    print("Routing over the sample corpus (per query):")
+    legacy = timed(lambda: [legacy_route(bot, q) for q in QUERIES], args.repeat) / len(QUERIES)
+    compiled = timed(lambda: [compiled_route(bot, q) for q in QUERIES], args.repeat) / len(QUERIES)
+    print(f"  legacy substring chains : {legacy * 1e6:8.2f} us")
+    print(f"  compiled matcher        : {compiled * 1e6:8.2f} us  ({legacy / compiled:.1f}x)")
+
+    print("\nRouting differences (legacy -> compiled):")
+    for query in QUERIES:
+        old, new = legacy_route(bot, query), compiled_route(bot, query)
+        if old != new:
+            print(f"  {query!r}\n    {old}\n    {new}")
+
+    rng = random.Random(7)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    terms = sorted({"".join(rng.choice(letters) for _ in range(rng.randint(4, 10)))
+                    for _ in range(args.terms)})
+    matcher = TermMatcher((("term", tuple(terms)),))
+    text = " ".join(rng.choice(terms) if rng.random() < 0.2 else "field" for _ in range(30))
+    repeat = max(1, args.repeat // 20)
+    legacy = timed(lambda: [t for t in terms if t in text], repeat)
+    compiled = timed(lambda: matcher.scan(text), repeat)
+    print(f"\nScaling with {len(terms)} terms (30-word message):")
+    print(f"  legacy substring scan   : {legacy * 1e6:8.2f} us")
+    print(f"  compiled matcher        : {compiled * 1e6:8.2f} us  ({legacy / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
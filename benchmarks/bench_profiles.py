@@ -0,0 +1,98 @@
+"""Load time, resident memory and tokens/sec for each inference profile.
+
+    python benchmarks/bench_profiles.py [--profiles fp32 bf16 int8] [--threads 8] [--json out.json]
+
+Every profile is measured in a fresh subprocess so memory numbers don't
+include a previously loaded model. Pick the winner per node type and set
+AGRIBOT_PROFILE / AGRIBOT_THREADS accordingly.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from memory import peak_rss_mb, rss_mb  # noqa: E402
+
+PROMPTS = [
+    "How do I control aphids on wheat without chemicals?",
+    "What is the best irrigation schedule for potato in sandy soil?",
+    "How can I improve clay soil before planting tomato?",
+]
+
+
+def measure(profile, threads, max_new_tokens):
+    import torch
+    from model_registry import READY, ModelRegistry
+
+    baseline = rss_mb()
+    registry = ModelRegistry(profile=profile, threads=threads)
+    if registry.load() != READY:
+        return {"profile": profile, "error": registry.error}
+
+    tokenizer, model = registry.tokenizer, registry.model
+    tokens, elapsed = 0, 0.0
+    for question in PROMPTS:
+        prompt = f"<|user|>\n{question}\n<|assistant|>\n"
+        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        started = time.perf_counter()
+        with torch.inference_mode():
+            output = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False,
+                                    pad_token_id=tokenizer.eos_token_id)
+        elapsed += time.perf_counter() - started
+        tokens += output.shape[1] - inputs["input_ids"].shape[1]
+
+    return {
+        "profile": registry.profile,
+        "requested": profile,
+        "threads": registry.threads,
+        "load_seconds": round(registry.load_seconds, 2),
+        "rss_mb": round(rss_mb() - baseline, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "tokens": tokens,
+        "tokens_per_second": round(tokens / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", default=["fp32", "bf16", "int8"])
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.threads, args.tokens)))
+        return
+
+    results = []
+    for profile in args.profiles:
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", profile, "--threads", str(args.threads),
+             "--tokens", str(args.tokens)],
+            capture_output=True, text=True, cwd=ROOT)
+        lines = output.stdout.strip().splitlines()
+        result = json.loads(lines[-1]) if output.returncode == 0 and lines else \
+            {"profile": profile, "error": output.stderr.strip().splitlines()[-1:]}
+        results.append(result)
+        if "error" in result:
+            print(f"{profile:>5}: failed ({result['error']})")
+        else:
+            print(f"{profile:>5}: load {result['load_seconds']:6.2f}s  rss {result['rss_mb']:8.1f} MB  "
+                  f"{result['tokens_per_second']:6.2f} tokens/s  ({result['threads']} threads)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Micro-benchmark suite for the message path, runnable without the real model.
+
+    python benchmarks/bench_suite.py                      # print results
+    python benchmarks/bench_suite.py --save               # rewrite benchmarks/baseline.json
+    python benchmarks/bench_suite.py --compare            # diff against the baseline
+
+Covers every routing stage, every handler, end-to-end process_message per
+route, cold start (import + construction in a fresh interpreter) and the
+latency of the first AI answer. Generation goes through ``benchmarks/stubs``
+with zero model latency by default, so the numbers measure AgriBot's own code;
+pass --decode-ms/--load-seconds to model a real CPU. The answer cache is
+disabled and the corpus and random seed are fixed, so runs are comparable.
+Commit the updated baseline together with a change that moves it.
+"""
+import argparse
+import functools
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+# Cached answers would turn AI routes into lookups; measure the uncached path
+os.environ["AGRIBOT_CACHE"] = "0"
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+SEED = 1234
+
+# (route, message): one or more queries for every branch of AgriBot.respond
+CORPUS = [
+    ("name", "Hi, my name is Ravi"),
+    ("name", "call me Anita please"),
+    ("usage_kb", "How to cook potato?"),
+    ("usage_kb", "how can I use corn at home"),
+    ("usage_ai", "how to store potato for months after harvest"),
+    ("usage_ai", "how to make tomato sauce at home"),
+    ("crop_info", "Tell me about wheat"),
+    ("crop_info", "what are the growing conditions for rice"),
+    ("crop_info", "I want to grow something this season"),
+    ("pest", "insects everywhere, I think aphids"),
+    ("pest", "some pest is causing damage to the leaves"),
+    ("disease", "the leaves have a disease that looks like rust"),
+    ("disease", "what disease causes blight"),
+    ("weather", "what to expect in rainy weather"),
+    ("weather", "heavy rain is expected this week"),
+    ("fertilizer", "which fertilizer and npk ratio is best"),
+    ("soil", "how do I improve soil ph"),
+    ("tips", "give me a tip"),
+    ("general_short", "hello there"),
+    ("general_short", "what is irrigation"),
+    ("general_ai", "what is the best way to manage water for a small farm in a dry region"),
+    ("general_ai", "what should a smallholder think about before switching to drip irrigation"),
+]
+AI_ROUTES = ("usage_ai", "general_ai")
+
+# Handler benchmarks: the handler, the routes whose queries it is timed on, whether it takes matches
+HANDLERS = [
+    ("handle_crop_info", ("crop_info",), True),
+    ("handle_pest_management", ("pest",), True),
+    ("handle_disease_management", ("disease",), True),
+    ("handle_weather_advice", ("weather",), True),
+    ("handle_fertilizer_advice", ("fertilizer",), True),
+    ("handle_soil_management", ("soil",), False),
+    ("handle_farming_tips", ("tips",), False),
+    ("handle_usage_info", ("usage_kb",), True),
+    ("handle_general_query", ("general_short",), True),
+]
+
+
+def summarize(samples_ns):
+    samples = sorted(samples_ns)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return {"median_us": round(statistics.median(samples) / 1000, 1), "p95_us": round(p95 / 1000, 1),
+            "samples": len(samples)}
+
+
+def time_calls(call, inputs, repeat, reset=None):
+    """Time call(*args) once per input per round; returns per-call nanoseconds"""
+    samples = []
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        for args in inputs:
+            started = time.perf_counter_ns()
+            call(*args)
+            samples.append(time.perf_counter_ns() - started)
+    return samples
+
+
+def bench_in_process(args):
+    import stubs
+    stubs.install(load_seconds=args.load_seconds, prefill_ms=0.0, decode_ms=args.decode_ms,
+                  reply_tokens=args.reply_tokens)
+    from bot import AgriBot, SessionContext
+
+    random.seed(SEED)
+    bot = AgriBot()
+    bot.load_model()
+    session = SessionContext()
+    reset = session.clear
+    results = {}
+
+    messages = [(message,) for _, message in CORPUS]
+    scanned = [(message, bot.scan(message)) for _, message in CORPUS]
+    in_session = [(message, matches, session) for message, matches in scanned]
+    results["route.scan"] = time_calls(bot.scan, messages, args.repeat)
+    results["route.get_user_name"] = time_calls(
+        bot.get_user_name, [(message, session) for _, message in CORPUS], args.repeat)
+    results["route.identify_intent"] = time_calls(bot.identify_intent, messages, args.repeat)
+    results["route.extract_crop_name"] = time_calls(bot.extract_crop_name, in_session, args.repeat, reset)
+    results["route.is_crop_related"] = time_calls(bot.is_crop_related, scanned, args.repeat)
+    results["route.respond_kb"] = time_calls(
+        bot.respond, [call for call, (route, _) in zip(in_session, CORPUS) if route not in AI_ROUTES],
+        args.repeat, reset)
+
+    kb = bot.kb
+    for handler, routes, takes_matches in HANDLERS:
+        inputs = [pair if takes_matches else pair[:1]
+                  for pair, (route, _) in zip(scanned, CORPUS) if route in routes]
+        call = getattr(bot, handler)
+        # process_message hands every handler the message's knowledge-base snapshot
+        if "kb" in inspect.signature(call).parameters:
+            call = functools.partial(call, kb=kb)
+        results[f"handler.{handler}"] = time_calls(call, inputs, args.repeat, reset)
+
+    for route in dict.fromkeys(route for route, _ in CORPUS):
+        inputs = [(message, session) for name, message in CORPUS if name == route]
+        repeat = args.ai_repeat if route in AI_ROUTES else args.repeat
+        results[f"process_message.{route}"] = time_calls(bot.process_message, inputs, repeat, reset)
+
+    return {name: summarize(samples) for name, samples in results.items()}
+
+
+def cold_start_probe(args):
+    """Run in a fresh interpreter: time import, construction and the first AI answer"""
+    started = time.perf_counter_ns()
+    import stubs
+    from bot import AgriBot, SessionContext
+    imported = time.perf_counter_ns()
+    stubs.install(load_seconds=args.load_seconds, prefill_ms=0.0, decode_ms=args.decode_ms,
+                  reply_tokens=args.reply_tokens)
+    random.seed(SEED)
+    bot = AgriBot()
+    session = SessionContext()
+    constructed = time.perf_counter_ns()
+    bot.process_message("Tell me about wheat", session)
+    first_kb = time.perf_counter_ns()
+    bot.process_message(next(message for route, message in CORPUS if route == "general_ai"), session)
+    first_ai = time.perf_counter_ns()
+    print(json.dumps({
+        "cold_start.import": imported - started,
+        "cold_start.construct": constructed - imported,
+        "cold_start.first_kb_answer": first_kb - constructed,
+        "cold_start.first_ai_answer": first_ai - first_kb,
+    }))
+
+
+def bench_cold_start(args):
+    command = [sys.executable, os.path.abspath(__file__), "--cold-start-probe",
+               "--load-seconds", str(args.load_seconds), "--decode-ms", str(args.decode_ms)]
+    if args.reply_tokens:
+        command += ["--reply-tokens", str(args.reply_tokens)]
+    samples = {}
+    for _ in range(args.cold_runs):
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        # The probe's JSON is its last line; anything before it is AgriBot's own printing
+        for name, value in json.loads(output.strip().splitlines()[-1]).items():
+            samples.setdefault(name, []).append(value)
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+def compare(results, baseline, tolerance):
+    """Print a per-benchmark diff of medians; returns the names that regressed"""
+    regressions = []
+    print(f"{'benchmark':45} {'baseline us':>12} {'now us':>12} {'change':>8}")
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:45} {'-':>12} {now['median_us']:>12} {'new':>8}")
+            continue
+        change = (now["median_us"] - before["median_us"]) / before["median_us"] if before["median_us"] else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  <-- slower"
+        print(f"{name:45} {before['median_us']:>12} {now['median_us']:>12} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="rounds over the corpus for fast paths")
+    parser.add_argument("--ai-repeat", type=int, default=10, help="rounds for routes that reach the model")
+    parser.add_argument("--cold-runs", type=int, default=5, help="fresh interpreters for cold start")
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="stub model load time")
+    parser.add_argument("--decode-ms", type=float, default=0.0, help="stub time per generated token")
+    parser.add_argument("--reply-tokens", type=int, default=None, help="stub reply length (default: the budget)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--save", action="store_true", help=f"overwrite {os.path.relpath(BASELINE_PATH)}")
+    parser.add_argument("--compare", action="store_true", help="diff medians against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="with --compare, exit 1 when a median is this much slower")
+    parser.add_argument("--cold-start-probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BENCH_DIR)
+    if args.cold_start_probe:
+        cold_start_probe(args)
+        return
+
+    results = bench_in_process(args)
+    results.update(bench_cold_start(args))
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+            "ai_repeat": args.ai_repeat,
+            "cold_runs": args.cold_runs,
+            "stub": {"load_seconds": args.load_seconds, "decode_ms": args.decode_ms,
+                     "reply_tokens": args.reply_tokens},
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if args.compare:
+        with open(BASELINE_PATH) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+    else:
+        print(f"{'benchmark':45} {'median us':>12} {'p95 us':>12}")
+        for name, stats in results.items():
+            print(f"{name:45} {stats['median_us']:>12} {stats['p95_us']:>12}")
+
+    for path in filter(None, (args.json, BASELINE_PATH if args.save else None)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"✅ Wrote {path}")
+
+    if regressions:
+        sys.exit(f"❌ {len(regressions)} benchmark(s) slower than baseline by more than {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
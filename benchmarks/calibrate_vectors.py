@@ -0,0 +1,74 @@
+"""Check the vector index's answer threshold against labelled paraphrase questions.
+
+    python vector_index.py build [--hashing]
+    python benchmarks/calibrate_vectors.py
+
+Every question in RELEVANT paraphrases a passage of the named PDF, and
+every question in UNRELATED has no answer in data/. A threshold is safe when
+no unrelated question and no question whose top passage comes from the wrong
+PDF scores at or above it. The report lists each question's top score and the
+lowest safe threshold with how many relevant questions it still answers.
+For a sentence-model index, that is the value to record in
+AGRIBOT_DOCUMENT_ANSWER_THRESHOLD; without it, no passage answers directly.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import INDEX_DIR, SentenceEmbedder, VectorIndex  # noqa: E402
+
+# (question, PDF that answers it; None when no passage in data/ does)
+RELEVANT = [
+    ("what does northern corn leaf blight look like on maize leaves", "pdf1.pdf"),
+    ("will commission agents lose their work in the mandis", "pdf3.pdf"),
+    ("will the government stop buying crops at minimum support price", "pdf3.pdf"),
+    ("how much of the world's harvest is lost to plant diseases every year", "pdf4.pdf"),
+    ("what are the four pillars of organic farming", "pdf2.pdf"),
+    ("in what forms are fungicides sold, dusts or granules", "pdf4.pdf"),
+    ("spots on leaves caused by bacteria or fungi", "pdf1.pdf"),
+    ("are the chemicals sprayed on fields harmful to children", "pdf2.pdf"),
+    ("what are the 5Fs of agriculture", "pdf2.pdf"),
+    ("leaves turning yellow and curling", None),
+]
+
+UNRELATED = [
+    "what is the best way to manage water for a small farm in a dry region",
+    "what should a smallholder think about before switching to drip irrigation",
+    "how can I get a loan to buy a tractor",
+    "what is the weather going to be like next week",
+    "how do I keep my goats healthy in winter",
+    "how do I improve clay soil before planting tomato",
+    "what is the ideal spacing for banana plants",
+    "how many hours of sunlight do chillies need",
+]
+
+
+def main():
+    index = VectorIndex(INDEX_DIR)
+    print(f"{index.manifest['embedder']}, {len(index.passages)} passages, "
+          f"threshold {index.match_threshold}")
+
+    correct, wrong = [], []
+    for question, document in RELEVANT:
+        score, found, page, _ = index.search(question, top_k=1)[0]
+        ok = document is not None and found == document
+        (correct if ok else wrong).append(score)
+        print(f"{score:6.3f}  {'ok ' if ok else 'BAD'}  {question}  -> {found} p.{page}")
+    for question in UNRELATED:
+        score, found, page, _ = index.search(question, top_k=1)[0]
+        wrong.append(score)
+        print(f"{score:6.3f}  --   {question}  -> {found} p.{page}")
+
+    safe = max(wrong) + 0.01
+    answered = sum(score >= safe for score in correct)
+    print(f"\nlowest safe threshold {safe:.2f}: answers {answered}/{len(correct)} relevant questions")
+    if isinstance(index.embedder, SentenceEmbedder) and index.match_threshold is None:
+        print(f"Direct document answers are off; record this with AGRIBOT_DOCUMENT_ANSWER_THRESHOLD={safe:.2f}")
+    if index.match_threshold is not None and index.match_threshold < safe:
+        print(f"⚠️ The configured threshold {index.match_threshold} answers some of these questions wrongly.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
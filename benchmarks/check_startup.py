@@ -0,0 +1,82 @@
+"""Startup budget check: fails when importing the engine gets slow or heavy.
+
+    python benchmarks/check_startup.py [--budget-ms 250] [--runs 5]
+
+In a fresh interpreter for each run it imports each entry module, builds an
+AgriBot and answers a knowledge-base question, in both the full and the
+kb_only mode. The fastest run must stay under the budget, and torch,
+transformers and the other optional heavy packages must not have been
+imported along the way. Exits 1 on any violation, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported only once the model, the vector index or a PDF rebuild is needed
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "pypdf", "numpy")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+from bot import SessionContext, get_bot
+get_bot().process_message("Tell me about wheat", SessionContext())
+answered = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "first_answer_ms": (answered - started) * 1000,
+    "heavy": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def probe(module, mode, runs):
+    env = dict(os.environ, AGRIBOT_MODE=mode, AGRIBOT_CACHE="0")
+    code = PROBE.format(module=module, heavy=HEAVY_MODULES)
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "import_ms": min(r["import_ms"] for r in results),
+        "first_answer_ms": min(r["first_answer_ms"] for r in results),
+        "heavy": sorted({name for r in results for name in r["heavy"]}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=250.0,
+                        help="maximum time from interpreter start to the first knowledge-base answer")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per case; the fastest counts")
+    parser.add_argument("--modules", nargs="+", default=["bot", "api"])
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':10} {'mode':8} {'import ms':>10} {'answer ms':>10}  heavy imports")
+    for module in args.modules:
+        for mode in ("full", "kb_only"):
+            result = probe(module, mode, args.runs)
+            heavy = ", ".join(result["heavy"]) or "-"
+            print(f"{module:10} {mode:8} {result['import_ms']:>10.1f} {result['first_answer_ms']:>10.1f}  {heavy}")
+            if result["heavy"]:
+                failures.append(f"{module} ({mode}) imported {heavy} before it was needed")
+            if result["first_answer_ms"] > args.budget_ms:
+                failures.append(f"{module} ({mode}) took {result['first_answer_ms']:.0f} ms to the first "
+                                f"answer, over the {args.budget_ms:.0f} ms budget")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"✅ Startup within {args.budget_ms:.0f} ms and free of heavy imports")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Load test: N concurrent chat sessions through AgriBot.process_message.
+
+    python benchmarks/load_test.py [--sessions 1 4 16 64] [--duration 30] [--ai-share 0.25]
+                                   [--think-seconds 1.0] [--real] [--json out.json]
+
+Every session is a SessionContext on its own thread, as Streamlit runs them,
+all sharing the process-wide AgriBot engine and inference worker. Sessions send a mix
+of knowledge-base and LLM-bound questions from the benchmark corpus (a share
+of --ai-share of them reach the model) with exponential think time between
+messages. Each concurrency level runs for --duration seconds and reports
+p50/p95/p99 latency per route, throughput, time spent queued for the
+worker, CPU use and RSS. By default generation goes through
+``benchmarks/stubs`` with a realistic CPU latency model; --real loads the
+configured model instead. The answer cache is off unless --cache is given,
+so repeated questions keep reaching the model.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from memory import peak_rss_mb, rss_mb  # noqa: E402
+
+SEED = 1234
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles(values):
+    """Nearest-rank p50/p95/p99 of values, in milliseconds"""
+    values = sorted(values)
+    if not values:
+        return {f"p{p}_ms": None for p in PERCENTILES}
+    return {f"p{p}_ms": round(values[min(len(values) - 1, -(-len(values) * p // 100) - 1)] * 1000, 1)
+            for p in PERCENTILES}
+
+
+def weighted_corpus(ai_share):
+    """(route, message) pairs and weights giving LLM-bound questions ai_share of the traffic"""
+    from bench_suite import AI_ROUTES, CORPUS
+
+    ai = [item for item in CORPUS if item[0] in AI_ROUTES]
+    kb = [item for item in CORPUS if item[0] not in AI_ROUTES]
+    weights = [ai_share / len(ai)] * len(ai) + [(1 - ai_share) / len(kb)] * len(kb)
+    return ai + kb, weights
+
+
+class Session(threading.Thread):
+    """One simulated farmer: ask, wait for the answer, think, repeat until the deadline"""
+
+    def __init__(self, number, corpus, weights, think_seconds, start):
+        super().__init__(name=f"session-{number}", daemon=True)
+        from bot import SessionContext, get_bot
+
+        self.bot = get_bot()
+        self.session = SessionContext()
+        self.random = random.Random(SEED + number)
+        self.corpus = corpus
+        self.weights = weights
+        self.think_seconds = think_seconds
+        self.start_barrier = start
+        # Set by run_level just before the barrier releases the sessions
+        self.deadline = None
+        # (route, source, seconds, queue_wait seconds)
+        self.samples = []
+        self.errors = 0
+
+    def run(self):
+        self.start_barrier.wait()
+        while time.perf_counter() < self.deadline:
+            route, message = self.random.choices(self.corpus, self.weights)[0]
+            started = time.perf_counter()
+            try:
+                self.bot.process_message(message, self.session)
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ {self.name}: {e}")
+                continue
+            elapsed = time.perf_counter() - started
+            trace = self.session.last_trace
+            queued = trace.summary().get("queue_wait", 0.0) / 1000
+            self.samples.append((route, trace.attributes.get("source"), elapsed, queued))
+            if self.think_seconds:
+                pause = self.random.expovariate(1 / self.think_seconds)
+                time.sleep(max(0.0, min(pause, self.deadline - time.perf_counter())))
+
+
+def run_level(sessions, args, corpus, weights, worker):
+    start = threading.Barrier(sessions + 1)
+    # Sessions are built before the clock starts; construction is not what is measured
+    threads = [Session(number, corpus, weights, args.think_seconds, start) for number in range(sessions)]
+    for thread in threads:
+        thread.start()
+
+    worker_before = worker.metrics()
+    cpu_before = os.times()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.deadline = began + args.duration
+    start.wait()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - began
+    cpu_after = os.times()
+    worker_after = worker.metrics()
+
+    samples = [sample for thread in threads for sample in thread.samples]
+    cpu_seconds = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+    routes = {}
+    for route, _, elapsed, _ in samples:
+        routes.setdefault(route, []).append(elapsed)
+    sources = {}
+    for _, source, _, _ in samples:
+        sources[source] = sources.get(source, 0) + 1
+    requests = worker_after["requests"] - worker_before["requests"]
+    batches = worker_after["batches"] - worker_before["batches"]
+    return {
+        "sessions": sessions,
+        "wall_seconds": round(wall, 2),
+        "messages": len(samples),
+        "errors": sum(thread.errors for thread in threads),
+        "throughput_per_second": round(len(samples) / wall, 2),
+        "latency": percentiles([elapsed for _, _, elapsed, _ in samples]),
+        "routes": {route: {"messages": len(values), **percentiles(values)}
+                   for route, values in sorted(routes.items())},
+        "sources": sources,
+        "queue_wait": percentiles([queued for route, _, _, queued in samples if queued]),
+        "worker": {
+            "requests": requests,
+            "mean_batch_size": round(requests / batches, 2) if batches else 0.0,
+            "tokens_generated": worker_after["tokens_generated"] - worker_before["tokens_generated"],
+        },
+        # Cores kept busy on average; 100% is one full core
+        "cpu_percent": round(100 * cpu_seconds / wall, 1),
+        "rss_mb": round(rss_mb(), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="concurrency levels, run in order")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per concurrency level")
+    parser.add_argument("--ai-share", type=float, default=0.25, help="fraction of questions that reach the model")
+    parser.add_argument("--think-seconds", type=float, default=1.0,
+                        help="mean pause between a session's messages (0 sends back to back)")
+    parser.add_argument("--real", action="store_true", help="use the configured model instead of the stub")
+    parser.add_argument("--decode-ms", type=float, help="stub time per token (default: stubs.DECODE_MS_PER_TOKEN)")
+    parser.add_argument("--prefill-ms", type=float,
+                        help="stub time per prompt token (default: stubs.PREFILL_MS_PER_TOKEN)")
+    parser.add_argument("--cache", action="store_true", help="keep the answer cache on")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # Settings are read on import, so this has to come before anything imports them
+    if not args.cache:
+        os.environ["AGRIBOT_CACHE"] = "0"
+    import stubs
+
+    if args.decode_ms is None:
+        args.decode_ms = stubs.DECODE_MS_PER_TOKEN
+    if args.prefill_ms is None:
+        args.prefill_ms = stubs.PREFILL_MS_PER_TOKEN
+    if not args.real:
+        stubs.install(load_seconds=0.0, prefill_ms=args.prefill_ms, decode_ms=args.decode_ms)
+    from inference_worker import get_worker
+    from model_registry import READY, get_registry
+
+    registry = get_registry()
+    if registry.load() != READY:
+        sys.exit(f"❌ Could not load {registry.model_id}: {registry.error or registry.state}")
+    worker = get_worker(registry)
+    corpus, weights = weighted_corpus(args.ai_share)
+
+    levels = []
+    print(f"{'sessions':>8} {'msgs/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'queue p95':>10} {'batch':>6} {'cpu %':>7} {'rss MB':>8}")
+    for sessions in args.sessions:
+        level = run_level(sessions, args, corpus, weights, worker)
+        levels.append(level)
+        latency, queued = level["latency"], level["queue_wait"]
+        print(f"{sessions:>8} {level['throughput_per_second']:>8} {latency['p50_ms']:>9} {latency['p95_ms']:>9} "
+              f"{latency['p99_ms']:>9} {queued['p95_ms'] or 0:>10} {level['worker']['mean_batch_size']:>6} "
+              f"{level['cpu_percent']:>7} {level['peak_rss_mb']:>8}")
+        for route, stats in level["routes"].items():
+            print(f"{'':>8} {route:16} n={stats['messages']:<5} p50 {stats['p50_ms']} ms  "
+                  f"p95 {stats['p95_ms']} ms  p99 {stats['p99_ms']} ms")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "model": registry.model_id if args.real else "stub",
+            "profile": registry.profile,
+            "duration_seconds": args.duration,
+            "ai_share": args.ai_share,
+            "think_seconds": args.think_seconds,
+            "cache": args.cache,
+            "stub": None if args.real else {"decode_ms": args.decode_ms, "prefill_ms": args.prefill_ms},
+        },
+        "levels": levels,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"✅ Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
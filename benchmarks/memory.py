@@ -0,0 +1,18 @@
+"""Process memory readings shared by the benchmarks."""
+import resource
+
+
+def rss_mb():
+    """Current resident set size in MB (Linux), falling back to the peak"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
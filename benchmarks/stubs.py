@@ -0,0 +1,105 @@
+"""Stand-in model for benchmarks: deterministic, no download, tunable latency.
+
+``install()`` swaps the process-wide registry and inference worker for stubs,
+so AgriBot runs its real routing, caching, prompt building, queueing and
+batching code while "generation" is a sleep proportional to the token count.
+Call it before the first AgriBot is created.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import inference_worker  # noqa: E402
+import model_registry  # noqa: E402
+from model_registry import FAILED, IDLE, READY  # noqa: E402
+
+# Default latency model, roughly phi-3-mini int8 on a 4-core laptop
+LOAD_SECONDS = 0.5
+PREFILL_MS_PER_TOKEN = 0.4
+DECODE_MS_PER_TOKEN = 45.0
+
+REPLY = ("Prepare the field well, sow certified seed at the recommended spacing, irrigate at "
+         "critical growth stages, scout weekly for pests and apply nutrients based on a soil test.")
+
+
+class StubTokenizer:
+    """Whitespace tokenizer with the slice of the HF interface AgriBot touches"""
+    eos_token_id = 0
+    pad_token_id = 0
+
+    def __call__(self, text, add_special_tokens=True, **kwargs):
+        if isinstance(text, str):
+            return {"input_ids": list(range(1, len(text.split()) + 1))}
+        return {"input_ids": [list(range(1, len(t.split()) + 1)) for t in text]}
+
+
+class StubRegistry(model_registry.ModelRegistry):
+    """Registry whose load() just waits load_seconds"""
+
+    def __init__(self, load_seconds=LOAD_SECONDS, fail=False):
+        super().__init__(model_id="stub")
+        self.state = IDLE
+        self.load_seconds_target = load_seconds
+        self.fail = fail
+
+    def load(self):
+        with self._lock:
+            if self.state in (READY, FAILED):
+                return self.state
+            started = time.perf_counter()
+            time.sleep(self.load_seconds_target)
+            if self.fail:
+                self.error = "stub load failure"
+                self.state = FAILED
+            else:
+                self.tokenizer = StubTokenizer()
+                self.generator = self.tokenizer
+                self.profile = "stub"
+                self.state = READY
+            self.load_seconds = time.perf_counter() - started
+        return self.state
+
+    def reset(self):
+        super().reset()
+        self.state = IDLE
+
+
+class StubWorker(inference_worker.InferenceWorker):
+    """Real queueing and batching; generation is a sleep and a canned reply"""
+
+    def __init__(self, registry, prefill_ms=PREFILL_MS_PER_TOKEN, decode_ms=DECODE_MS_PER_TOKEN,
+                 reply_tokens=None, **kwargs):
+        super().__init__(registry, **kwargs)
+        self.prefill_ms = prefill_ms
+        self.decode_ms = decode_ms
+        self.reply_tokens = reply_tokens
+
+    def _generate_batch(self, requests):
+        started = time.perf_counter()
+        tokenizer = self.registry.tokenizer
+        prompt_tokens = max(len(tokenizer(str(r.prompt))["input_ids"]) for r in requests)
+        budget = max(r.max_new_tokens for r in requests)
+        new_tokens = min(self.reply_tokens, budget) if self.reply_tokens else budget
+        time.sleep((prompt_tokens * len(requests) * self.prefill_ms) / 1000)
+        produced = 0
+        # Decode one step at a time so cancellation and deadlines behave like the real loop
+        for _ in range(new_tokens):
+            if all(r.should_stop() for r in requests):
+                break
+            time.sleep(self.decode_ms / 1000)
+            produced += 1
+        for request in requests:
+            request.timings["generate"] = time.perf_counter() - started
+        return [REPLY] * len(requests), produced * len(requests)
+
+
+def install(load_seconds=LOAD_SECONDS, prefill_ms=PREFILL_MS_PER_TOKEN, decode_ms=DECODE_MS_PER_TOKEN,
+            reply_tokens=None, fail=False):
+    """Replace the process-wide registry and worker with stubs; returns the registry"""
+    registry = StubRegistry(load_seconds=load_seconds, fail=fail)
+    model_registry._registry = registry
+    inference_worker._worker = StubWorker(registry, prefill_ms=prefill_ms, decode_ms=decode_ms,
+                                          reply_tokens=reply_tokens)
+    return registry
@@ -0,0 +1,181 @@
+"""Answer a JSONL file of questions offline.
+
+    python bulk_answer.py questions.jsonl answers.jsonl [--workers 4] [--batch-size 8]
+
+Each input line is either a JSON string or an object with a "question" field
+(and an optional "id"). Knowledge-base routing runs across a process pool;
+questions that need the language model come back with their prompt already
+prepared and are generated in parallel on the batching inference worker, so
+they share padded batches. Results are streamed to the output file as they
+finish, one JSON object per line, and progress goes to stderr.
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from itertools import islice
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from bot import AgriBot, SessionContext, get_bot, response_source
+from inference_worker import get_worker
+
+_bot = None
+
+
+def _init_worker():
+    # Runs in a spawned process, so the bot opens its own answer-cache connection
+    # instead of sharing the parent's SQLite handle
+    global _bot
+    _bot = AgriBot(defer_generation=True)
+
+
+def _route(item):
+    """Answer one question from the knowledge base, or hand back its AI request"""
+    index, record = item
+    if "error" in record:
+        return index, record, None, None
+    # Every question is answered on its own, without earlier ones as history
+    session = SessionContext()
+    question = record["question"]
+    answer = _bot.process_message(question, session)
+    result = dict(record, answer=answer, source=response_source(answer),
+                  intent=session.last_trace.attributes["intent"])
+    return index, result, session.deferred, answer
+
+
+def _route_chunk(items):
+    return [_route(item) for item in items]
+
+
+def chunked(items, size):
+    """Lists of up to size consecutive items, read lazily"""
+    items = iter(items)
+    return iter(lambda: list(islice(items, size)), [])
+
+
+def read_questions(path):
+    """Yield (line number, record) without loading the whole file"""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError as e:
+                yield number, {"line": number, "error": f"invalid JSON: {e}"}
+                continue
+            if isinstance(value, str):
+                value = {"question": value}
+            if not isinstance(value, dict) or not isinstance(value.get("question"), str):
+                yield number, {"line": number, "error": "expected a string or an object with a 'question'"}
+                continue
+            value.setdefault("id", number)
+            yield number, value
+
+
+class Progress:
+    def __init__(self, every=5.0):
+        self.every = every
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.sources = Counter()
+        self.errors = 0
+        self.done = 0
+
+    def record(self, result):
+        self.done += 1
+        if "error" in result:
+            self.errors += 1
+        else:
+            self.sources[result["source"]] += 1
+
+    def report(self, tokens, final=False):
+        now = time.perf_counter()
+        if not final and now - self.last < self.every:
+            return
+        self.last = now
+        elapsed = max(now - self.started, 1e-9)
+        split = ", ".join(f"{source} {count}" for source, count in sorted(self.sources.items()))
+        print(f"{'done' if final else 'progress'}: {self.done} questions in {elapsed:.1f}s "
+              f"({self.done / elapsed:.1f} q/s, {tokens / elapsed:.1f} tokens/s) [{split or '-'}"
+              f"{f', errors {self.errors}' if self.errors else ''}]", file=sys.stderr)
+
+
+def run(input_path, output_path, workers=4, batch_size=8, chunksize=16):
+    generator_bot = get_bot()
+    progress = Progress()
+    pending = {}
+    llm_pool = None
+    ai_available = None
+
+    def tokens():
+        return get_worker(generator_bot.registry).metrics()["tokens_generated"] if llm_pool else 0
+
+    def write(out, result):
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        progress.record(result)
+
+    def finish(future):
+        result, fallback = pending.pop(future)
+        answer = future.result() or fallback
+        return dict(result, answer=answer, source=response_source(answer))
+
+    def handle(out, routed):
+        nonlocal ai_available, llm_pool
+        for index, result, deferred, fallback in routed:
+            if deferred is not None and ai_available is None:
+                # First AI-bound question: load the model once in this process
+                generator_bot.load_model()
+                ai_available = generator_bot.generator is not None
+                if ai_available:
+                    # Let the shared worker pad all concurrent bulk requests into one batch
+                    worker = get_worker(generator_bot.registry)
+                    worker.max_batch_size = max(worker.max_batch_size, batch_size)
+                    llm_pool = ThreadPoolExecutor(max_workers=batch_size, thread_name_prefix="agribot-bulk")
+
+            if deferred is None or not ai_available:
+                write(out, result)
+            else:
+                pending[llm_pool.submit(generator_bot.complete, deferred)] = (result, fallback)
+                # Keep at most a couple of batches in flight so memory stays flat
+                if len(pending) >= 2 * batch_size:
+                    for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                        write(out, finish(future))
+            progress.report(tokens())
+
+    with open(output_path, "w", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Only a couple of chunks per process are routed ahead of the writer, so the
+        # input is read as it is answered instead of being submitted all at once
+        routing = deque()
+        for chunk in chunked(read_questions(input_path), chunksize):
+            routing.append(pool.submit(_route_chunk, chunk))
+            if len(routing) >= 2 * workers:
+                handle(out, routing.popleft().result())
+        while routing:
+            handle(out, routing.popleft().result())
+
+        for future in wait(list(pending)).done:
+            write(out, finish(future))
+        if llm_pool is not None:
+            llm_pool.shutdown()
+    progress.report(tokens(), final=True)
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of farmer questions")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=4, help="knowledge-base routing processes")
+    parser.add_argument("--batch-size", type=int, default=8, help="AI questions generated concurrently")
+    args = parser.parse_args()
+    run(args.input, args.output, workers=args.workers, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Bounded chat transcript for the Streamlit page.
+
+A session keeps only its most recent messages in ``st.session_state``; older
+ones are packed in chunks into a process-wide archive, zlib-compressed, and
+the archive evicts the oldest chunks of any session once it passes its byte
+budget. The page renders a window of recent messages and pages further back
+on request. Each message caches its rendered HTML so reruns don't rebuild it.
+"""
+import json
+import threading
+import zlib
+from collections import OrderedDict, deque
+
+import settings
+
+# Decompressed chunks kept around for sessions paging through old messages
+DECODED_CHUNKS = 32
+
+
+class ChatMessage:
+    __slots__ = ("role", "content", "_html")
+
+    def __init__(self, role, content):
+        self.role = role
+        self.content = content
+        self._html = None
+
+    def html(self, formatter):
+        """formatter(content), computed once per message"""
+        if self._html is None:
+            self._html = formatter(self.content)
+        return self._html
+
+
+class ChatArchive:
+    """Compressed older messages of every session, evicted oldest first past max_bytes"""
+
+    def __init__(self, max_bytes=settings.CHAT_ARCHIVE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evicted_chunks = 0
+        # (session_id, seq) -> (blob, message count); insertion order is age
+        self._chunks = OrderedDict()
+        # session_id -> deque of seqs still stored, oldest first
+        self._sessions = {}
+        self._next_seq = 0
+        self._decoded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, session_id, messages):
+        blob = zlib.compress(json.dumps([(m.role, m.content) for m in messages]).encode("utf-8"))
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._chunks[(session_id, seq)] = (blob, len(messages))
+            self._sessions.setdefault(session_id, deque()).append(seq)
+            self.total_bytes += len(blob)
+            while self.total_bytes > self.max_bytes and len(self._chunks) > 1:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        (session_id, seq), (blob, _) = self._chunks.popitem(last=False)
+        self.total_bytes -= len(blob)
+        self.evicted_chunks += 1
+        seqs = self._sessions[session_id]
+        seqs.remove(seq)
+        if not seqs:
+            del self._sessions[session_id]
+        self._decoded.pop((session_id, seq), None)
+
+    def count(self, session_id):
+        """Archived messages still available for session_id"""
+        with self._lock:
+            return sum(self._chunks[(session_id, seq)][1] for seq in self._sessions.get(session_id, ()))
+
+    def chunks(self, session_id):
+        """Archived messages of session_id, one list per chunk, newest chunk first"""
+        with self._lock:
+            seqs = list(self._sessions.get(session_id, ()))
+        for seq in reversed(seqs):
+            messages = self._decode(session_id, seq)
+            if messages is not None:
+                yield messages
+
+    def _decode(self, session_id, seq):
+        key = (session_id, seq)
+        with self._lock:
+            if key in self._decoded:
+                self._decoded.move_to_end(key)
+                return self._decoded[key]
+            entry = self._chunks.get(key)
+        if entry is None:
+            return None
+        messages = [ChatMessage(role, content)
+                    for role, content in json.loads(zlib.decompress(entry[0]).decode("utf-8"))]
+        with self._lock:
+            self._decoded[key] = messages
+            while len(self._decoded) > DECODED_CHUNKS:
+                self._decoded.popitem(last=False)
+        return messages
+
+    def drop(self, session_id):
+        with self._lock:
+            for seq in self._sessions.pop(session_id, ()):
+                blob, _ = self._chunks.pop((session_id, seq))
+                self.total_bytes -= len(blob)
+                self._decoded.pop((session_id, seq), None)
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions), "chunks": len(self._chunks),
+                    "bytes": self.total_bytes, "evicted_chunks": self.evicted_chunks}
+
+
+class ChatHistory:
+    """One session's transcript: recent messages live, the rest in the archive"""
+
+    def __init__(self, session_id, archive=None, max_live=settings.CHAT_LIVE_MESSAGES,
+                 chunk_size=settings.CHAT_PAGE_SIZE):
+        self.session_id = session_id
+        self.archive = archive or get_chat_archive()
+        self.max_live = max(max_live, chunk_size)
+        self.chunk_size = chunk_size
+        self.live = deque()
+
+    def append(self, role, content):
+        self.live.append(ChatMessage(role, content))
+        if len(self.live) > self.max_live:
+            self.archive.put(self.session_id, [self.live.popleft() for _ in range(self.chunk_size)])
+
+    def __len__(self):
+        """Messages that can still be shown, live and archived"""
+        return len(self.live) + self.archive.count(self.session_id)
+
+    def recent(self, count):
+        """The newest count messages, oldest first, reading archived chunks only as needed"""
+        live = list(self.live)
+        needed = count - len(live)
+        if needed <= 0:
+            return live[-count:] if count > 0 else []
+        older = []
+        for chunk in self.archive.chunks(self.session_id):
+            older = chunk + older
+            if len(older) >= needed:
+                break
+        return older[-needed:] + live
+
+    def clear(self):
+        self.live.clear()
+        self.archive.drop(self.session_id)
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_chat_archive():
+    """Return the process-wide archive shared by every session"""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = ChatArchive()
+    return _archive
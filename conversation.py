@@ -0,0 +1,121 @@
+"""Bounded per-session conversation memory for multi-turn AI prompts.
+
+Turns are tokenized once, when first packed, and keep their token count, so
+building the history for a new prompt never re-tokenizes the transcript.
+Recent turns are packed verbatim under a token budget; turns that don't fit
+are reduced to a one-line summary, and turns past the storage limit are
+folded into a short rolling summary of earlier questions.
+"""
+import re
+from collections import deque
+
+import settings
+
+HEADER_RE = re.compile(r"^\*\*[^*]+:\*\*\s*")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Words kept per turn when compressing and for the rolling summary
+SUMMARY_WORDS = 25
+ROLLING_SUMMARY_WORDS = 60
+
+
+def compress(text, max_words=SUMMARY_WORDS):
+    """First sentence of a message without its answer header, capped at max_words"""
+    text = HEADER_RE.sub("", text.strip())
+    first = SENTENCE_RE.split(" ".join(text.split()), maxsplit=1)[0]
+    words = first.split()
+    if len(words) > max_words:
+        return " ".join(words[:max_words]) + " ..."
+    return first
+
+
+class Turn:
+    __slots__ = ("role", "text", "crop", "_token_counts")
+
+    def __init__(self, role, text, crop=None):
+        self.role = role
+        self.text = text
+        self.crop = crop
+        self._token_counts = {}
+
+    @property
+    def speaker(self):
+        return "Farmer" if self.role == "user" else "AgriBot"
+
+    def line(self, compressed=False):
+        text = compress(self.text) if compressed else self.text
+        return f"{self.speaker}: {text}\n"
+
+    def tokens(self, tokenizer, compressed=False):
+        """Token count of this turn's prompt line, computed once per tokenizer"""
+        key = (id(tokenizer), compressed)
+        count = self._token_counts.get(key)
+        if count is None:
+            line = self.line(compressed)
+            if tokenizer is None:
+                # Rough estimate until the model's tokenizer is loaded
+                count = len(line) // 4 + 1
+            else:
+                count = len(tokenizer(line, add_special_tokens=False)["input_ids"])
+            self._token_counts[key] = count
+        return count
+
+
+class ConversationMemory:
+    """Recent turns of one chat session, packed into prompts under a token budget"""
+    __slots__ = ("token_budget", "turns", "summary", "crop")
+
+    def __init__(self, token_budget=settings.HISTORY_TOKEN_BUDGET, max_turns=settings.HISTORY_MAX_TURNS):
+        self.token_budget = token_budget
+        self.turns = deque(maxlen=max_turns)
+        self.summary = ""
+        self.crop = None
+
+    def __len__(self):
+        return len(self.turns)
+
+    def add(self, role, text, crop=None):
+        if len(self.turns) == self.turns.maxlen:
+            self._fold(self.turns[0])
+        self.turns.append(Turn(role, text, crop))
+        if crop:
+            self.crop = crop
+
+    def _fold(self, turn):
+        """Keep a few words of a dropped farmer question in the rolling summary"""
+        if turn.role != "user":
+            return
+        words = (self.summary + " " + compress(turn.text, 12).rstrip(".?!") + ";").split()
+        self.summary = " ".join(words[-ROLLING_SUMMARY_WORDS:])
+
+    def last_crop(self):
+        """Most recent crop the farmer mentioned, for follow-ups like 'its fertilizer'"""
+        return self.crop
+
+    def render(self, tokenizer=None, token_budget=None):
+        """History block for a prompt, newest turns verbatim, older ones compressed"""
+        budget = self.token_budget if token_budget is None else token_budget
+        if budget <= 0 or not self.turns:
+            return ""
+        lines = []
+        used = 0
+        for turn in reversed(self.turns):
+            full = turn.tokens(tokenizer)
+            if used + full <= budget:
+                lines.append(turn.line())
+                used += full
+                continue
+            short = turn.tokens(tokenizer, compressed=True)
+            if used + short > budget:
+                break
+            lines.append(turn.line(compressed=True))
+            used += short
+        if self.summary and len(lines) == len(self.turns):
+            lines.append(f"Earlier questions: {self.summary}\n")
+        lines.reverse()
+        return "Conversation so far:\n" + "".join(lines)
+
+    def clear(self):
+        self.turns.clear()
+        self.summary = ""
+        self.crop = None
@@ -0,0 +1,113 @@
+"""Token budgets and early stopping for AI answers.
+
+A fixed max_new_tokens spent as much CPU on "when should I sow wheat" as on
+a step-by-step growing guide. ``token_budget`` sizes each request from its
+intent and how much the question asks for, and ``load_cap`` lowers every
+budget while the inference queue is backed up. A ``StopTracker`` follows each
+reply token by token and ends it at an end-of-turn marker or once it starts
+repeating itself, so answers stop when they are done, not at the budget.
+"""
+import re
+
+import settings
+
+# Starting budget per intent, before the question's own cues are weighed
+BASE_BUDGETS = {"general": 160, "usage_info": 224}
+DEFAULT_BUDGET = 160
+# Budgets are rounded up to a multiple of this
+BUDGET_STEP = 16
+LONG_QUESTION_WORDS = 20
+
+# Cues that a question wants an explanation, or just a fact
+EXPANSIVE_RE = re.compile(
+    r"\b(?:how(?! (?:much|many|long|often))|why|explain|steps?|guide|compare|difference|plan|schedule|"
+    r"list|details?|detailed|process|method)\b")
+FACTUAL_RE = re.compile(
+    r"\b(?:what is|what are|when|which|how (?:much|many|long|often)|best time|is it|can i|should i)\b")
+
+# Text the model writes when it starts a new turn instead of ending its own
+STOP_MARKERS = ("<|end|>", "<|user|>", "<|assistant|>", "<|system|>", "\nQuestion:")
+# Tokens decoded at the end of a reply when looking for a marker
+MARKER_WINDOW = 8
+
+# A run of REPEAT_NGRAM tokens seen REPEAT_LIMIT times is a loop, not an answer
+REPEAT_NGRAM = 8
+REPEAT_LIMIT = 3
+
+
+def token_budget(intent, message):
+    """max_new_tokens for an answer to message under intent"""
+    text = message.lower()
+    expansive = len(EXPANSIVE_RE.findall(text))
+    if not expansive and FACTUAL_RE.search(text):
+        factor = 0.5
+    else:
+        factor = 1.0 + 0.25 * min(expansive, 2)
+    if len(text.split()) > LONG_QUESTION_WORDS:
+        factor += 0.25
+    budget = int(BASE_BUDGETS.get(intent, DEFAULT_BUDGET) * factor)
+    budget = -(-budget // BUDGET_STEP) * BUDGET_STEP
+    return max(settings.GENERATION_MIN_TOKENS, min(budget, settings.GENERATION_MAX_TOKENS))
+
+
+def load_cap(queue_depth):
+    """Ceiling on any budget while queue_depth requests wait for the worker"""
+    cap = settings.GENERATION_MAX_TOKENS
+    if settings.GENERATION_SHED_QUEUE_DEPTH > 0:
+        cap = int(cap / 2 ** (queue_depth / settings.GENERATION_SHED_QUEUE_DEPTH))
+    return max(settings.GENERATION_MIN_TOKENS, cap)
+
+
+def trim_reply(text):
+    """text up to the first end-of-turn marker"""
+    for marker in STOP_MARKERS:
+        index = text.find(marker)
+        if index >= 0:
+            text = text[:index]
+    return text
+
+
+class StopTracker:
+    """Follows one reply token by token and decides when it is finished"""
+    __slots__ = ("decode", "budget", "eos_token_id", "tokens", "starts", "cut", "reason")
+
+    def __init__(self, decode, budget, eos_token_id=None):
+        self.decode = decode
+        self.budget = budget
+        self.eos_token_id = eos_token_id
+        self.tokens = []
+        # n-gram -> start positions of its non-overlapping occurrences
+        self.starts = {}
+        self.cut = None
+        # eos, marker, repetition or budget once stopped
+        self.reason = None
+
+    def add(self, token):
+        """Record the next token; True once the reply should stop"""
+        if self.reason is not None:
+            return True
+        if token == self.eos_token_id:
+            self.reason = "eos"
+            return True
+        tokens = self.tokens
+        tokens.append(token)
+        if len(tokens) >= REPEAT_NGRAM:
+            start = len(tokens) - REPEAT_NGRAM
+            starts = self.starts.setdefault(tuple(tokens[start:]), [])
+            if not starts or start - starts[-1] >= REPEAT_NGRAM:
+                starts.append(start)
+                if len(starts) >= REPEAT_LIMIT:
+                    # Keep the first occurrence, drop the repeats
+                    self.cut = starts[1]
+                    self.reason = "repetition"
+                    return True
+        tail = self.decode(tokens[-MARKER_WINDOW:])
+        if any(marker in tail for marker in STOP_MARKERS):
+            self.reason = "marker"
+        elif len(tokens) >= self.budget:
+            self.reason = "budget"
+        return self.reason is not None
+
+    @property
+    def reply_tokens(self):
+        return self.tokens[:self.cut] if self.cut is not None else self.tokens
@@ -0,0 +1,362 @@
+"""Single inference worker that owns the model and micro-batches requests.
+
+Streamlit runs every session on its own script thread, so concurrent AI
+fallbacks used to call the pipeline in parallel and fight over the same CPU
+cores. All generation now goes through one worker thread: prompts queue up,
+requests that arrive within a short window are padded into one batched
+``model.generate`` call, and each caller gets its own reply back through a
+future.
+
+Every request carries a deadline and a cancel event that a stopping criterion
+checks after each generated token, so abandoned, superseded or overdue
+requests stop consuming CPU. The same criterion ends each row at its own
+token budget, at an end-of-turn marker or in a repetition loop, and budgets
+are capped further while the queue is backed up. It also passes each
+streaming row's new tokens to that request's own streamer, so streamed chat
+answers share batches like any other request.
+
+A request that has the worker to itself is decoded with the registry's
+draft model when one is loaded: batching already keeps the CPU busy under
+load, assisted decoding cuts latency when it is idle.
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import settings
+import telemetry
+from generation_budget import StopTracker, load_cap, trim_reply
+
+
+class GenerationCancelled(Exception):
+    """The request was cancelled before its reply was complete"""
+
+
+class GenerationTimeout(GenerationCancelled):
+    """The request ran past its deadline"""
+
+
+class InferenceRequest:
+    __slots__ = ("prompt", "max_new_tokens", "sampling", "streamer", "future", "enqueued_at",
+                 "cancel_event", "deadline", "timings")
+
+    def __init__(self, prompt, max_new_tokens, sampling, streamer=None, cancel_event=None, deadline=None):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.sampling = sampling
+        self.streamer = streamer
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.cancel_event = cancel_event or threading.Event()
+        self.deadline = deadline
+        # Seconds per worker-side stage (queue_wait, tokenize, generate, decode)
+        self.timings = {}
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.future.cancel()
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def should_stop(self):
+        return self.cancel_event.is_set() or self.expired
+
+    def stop_reason(self):
+        if self.expired:
+            return GenerationTimeout("generation deadline passed")
+        return GenerationCancelled("generation was cancelled")
+
+    def record_timings(self):
+        """Add the worker-side stages to the caller's trace"""
+        for name, seconds in self.timings.items():
+            telemetry.record(name, seconds)
+
+    @property
+    def template(self):
+        """Name of the prompt template, or None for a plain text prompt"""
+        template = getattr(self.prompt, "template", None)
+        return template.name if template is not None else None
+
+    @property
+    def batch_key(self):
+        """Requests can share a generate call only with identical sampling and template.
+
+        Budgets may differ; each row stops at its own.
+        """
+        return (tuple(sorted(self.sampling.items())), self.template)
+
+
+class InferenceWorker:
+    """Background thread running batched generation for every session"""
+
+    def __init__(self, registry, max_batch_size=settings.BATCH_MAX_SIZE,
+                 max_wait_ms=settings.BATCH_WAIT_MS, assisted=True):
+        self.registry = registry
+        # Whether lone requests use the registry's draft model when one is loaded
+        self.assisted = assisted
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.requests = 0
+        self.batches = 0
+        self.batch_sizes = Counter()
+        self.tokens_generated = 0
+        self.assisted_requests = 0
+        self.cancelled = 0
+        self.busy_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="agribot-inference", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, prompt, max_new_tokens, sampling, streamer=None, cancel_event=None, deadline=None):
+        """Queue a prompt and return its InferenceRequest; request.future resolves to the reply"""
+        request = InferenceRequest(prompt, max_new_tokens, sampling, streamer, cancel_event, deadline)
+        self.start()
+        self._queue.put(request)
+        return request
+
+    def generate(self, prompt, max_new_tokens, sampling, timeout=None, cancel_event=None):
+        """Blocking generation that gives up after timeout seconds"""
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        request = self.submit(prompt, max_new_tokens, sampling, cancel_event=cancel_event, deadline=deadline)
+        try:
+            reply = request.future.result(timeout=timeout)
+            request.record_timings()
+            return reply
+        except FutureTimeout:
+            raise GenerationTimeout("generation deadline passed") from None
+        finally:
+            if not request.future.done():
+                request.cancel()
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _collect(self):
+        """Block for one request, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.batch_key, []).append(request)
+            for requests in groups.values():
+                self._process(requests)
+
+    def _process(self, requests):
+        started = time.perf_counter()
+        live = []
+        for request in requests:
+            self.queue_wait_seconds += started - request.enqueued_at
+            request.timings["queue_wait"] = started - request.enqueued_at
+            if request.should_stop() or not request.future.set_running_or_notify_cancel():
+                self._drop(request)
+            else:
+                live.append(request)
+        requests = live
+        if not requests:
+            return
+        # Whoever is still waiting behind this batch shortens it
+        cap = load_cap(self.queue_depth)
+        for request in requests:
+            request.max_new_tokens = min(request.max_new_tokens, cap)
+        try:
+            replies, tokens = self._generate_batch(requests)
+        except Exception as e:
+            for request in requests:
+                if request.streamer is not None:
+                    request.streamer.end()
+                request.future.set_exception(e)
+        else:
+            for request, reply in zip(requests, replies):
+                if request.should_stop():
+                    self._drop(request)
+                else:
+                    request.future.set_result(reply)
+                    if request.streamer is not None:
+                        request.streamer.end()
+            self.tokens_generated += tokens
+            telemetry.TOKENS_GENERATED.inc(tokens)
+        self.busy_seconds += time.perf_counter() - started
+        self.requests += len(requests)
+        self.batches += 1
+        self.batch_sizes[len(requests)] += 1
+
+    def _drop(self, request):
+        """Finish a cancelled or overdue request without a reply"""
+        self.cancelled += 1
+        if request.streamer is not None:
+            request.streamer.end()
+        if request.future.cancelled():
+            return
+        try:
+            request.future.set_exception(request.stop_reason())
+        except Exception:
+            # The future already holds a result or was cancelled meanwhile
+            pass
+
+    def _generate_batch(self, requests):
+        import torch
+        from transformers import StoppingCriteriaList
+
+        tokenizer, model = self.registry.tokenizer, self.registry.model
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        # Decoder-only models need left padding so every prompt ends at the same column
+        tokenizer.padding_side = "left"
+
+        started = time.perf_counter()
+        first = requests[0]
+        kwargs = dict(first.sampling)
+        prefix = self.registry.prefix_caches.get(first.template) if first.template else None
+        suffixes = None
+        if prefix is not None:
+            # Cut from the full prompts' tokens, so cached and uncached requests see the same ids
+            suffixes = prefix.split(tokenizer([str(r.prompt) for r in requests])["input_ids"])
+        if suffixes is not None:
+            # Shared prefix comes from its precomputed KV cache; only the suffixes are prefilled
+            batch = len(requests)
+            width = max(len(row) for row in suffixes)
+            suffix_ids = torch.tensor([[tokenizer.pad_token_id] * (width - len(row)) + row for row in suffixes],
+                                      device=model.device)
+            suffix_mask = torch.tensor([[0] * (width - len(row)) + [1] * len(row) for row in suffixes],
+                                       device=model.device)
+            inputs = {
+                "input_ids": torch.cat([prefix.input_ids.expand(batch, -1), suffix_ids], dim=1),
+                "attention_mask": torch.cat([torch.ones((batch, prefix.length), dtype=suffix_mask.dtype,
+                                                        device=model.device), suffix_mask], dim=1),
+            }
+            kwargs["past_key_values"] = prefix.copy_for_batch(batch)
+        else:
+            inputs = tokenizer([str(r.prompt) for r in requests], return_tensors="pt",
+                               padding=True).to(model.device)
+
+        trackers = [StopTracker(tokenizer.decode, request.max_new_tokens, tokenizer.eos_token_id)
+                    for request in requests]
+        kwargs["stopping_criteria"] = StoppingCriteriaList([
+            _reply_criteria(requests, trackers, inputs["input_ids"].shape[1])])
+        if self.assisted and len(requests) == 1:
+            # Assisted generation runs one sequence at a time
+            assistant = self.registry.assistant_kwargs(first.sampling)
+            if assistant:
+                kwargs.update(assistant)
+                self.assisted_requests += 1
+        tokenized = time.perf_counter()
+        with torch.inference_mode():
+            output = model.generate(
+                **inputs,
+                max_new_tokens=max(request.max_new_tokens for request in requests),
+                pad_token_id=tokenizer.pad_token_id,
+                **kwargs
+            )
+
+        # Replies come from what generate() returned, not from what the criterion was shown
+        generated = time.perf_counter()
+        trackers = [_replay(tokenizer, request.max_new_tokens, row)
+                    for request, row in zip(requests, output[:, inputs["input_ids"].shape[1]:].tolist())]
+        rows = [tracker.reply_tokens for tracker in trackers]
+        count = sum(len(tracker.tokens) for tracker in trackers)
+        for tracker in trackers:
+            telemetry.GENERATION_STOPS.inc(reason=tracker.reason or "cancelled")
+        replies = [trim_reply(text).strip() for text in tokenizer.batch_decode(rows, skip_special_tokens=True)]
+        timings = {"tokenize": tokenized - started, "generate": generated - tokenized,
+                   "decode": time.perf_counter() - generated}
+        for request in requests:
+            request.timings.update(timings)
+        return replies, count
+
+    def metrics(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": (self.requests / self.batches) if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "cancelled": self.cancelled,
+            "tokens_generated": self.tokens_generated,
+            "assisted_requests": self.assisted_requests,
+            "tokens_per_second": (self.tokens_generated / self.busy_seconds) if self.busy_seconds else 0.0,
+            "mean_queue_wait_ms": (1000 * self.queue_wait_seconds / self.requests) if self.requests else 0.0,
+        }
+
+
+def _replay(tokenizer, budget, row):
+    """StopTracker fed one generated row up to the point where the reply ended"""
+    tracker = StopTracker(tokenizer.decode, budget, tokenizer.eos_token_id)
+    for token in row:
+        if tracker.add(token):
+            break
+    return tracker
+
+
+def _reply_criteria(requests, trackers, prompt_length):
+    """Stopping criterion ending each row of a batch once its reply is finished, cancelled or overdue"""
+    import torch
+    from transformers import StoppingCriteria
+
+    class ReplyCriteria(StoppingCriteria):
+        # scores is None unless generate() is asked to return them, so it is never looked at.
+        # The criterion is given to the main model's generate() only; in assisted decoding the
+        # draft model runs its own generate() without it, and this is called once the drafted
+        # tokens have been verified. input_ids therefore hold committed tokens only.
+        seen = prompt_length
+
+        def __call__(self, input_ids, scores, **kwargs):
+            # Usually one new token per row, several when drafted tokens were accepted;
+            # committed rows only ever grow, so the trackers continue where they left off
+            new = input_ids[:, self.seen:].tolist()
+            self.seen = input_ids.shape[1]
+            finished = []
+            for request, tracker, row in zip(requests, trackers, new):
+                streamed = len(tracker.tokens)
+                # Every tracker sees its tokens, even when the request is already stopping
+                finished.append(any([tracker.add(token) for token in row]))
+                if request.streamer is not None and len(tracker.tokens) > streamed:
+                    # Each row streams on its own; generate() only drives a streamer for a batch of one
+                    request.streamer.put(torch.tensor(tracker.tokens[streamed:]))
+            return torch.tensor([done or request.should_stop() for done, request in zip(finished, requests)],
+                                dtype=torch.bool, device=input_ids.device)
+
+    return ReplyCriteria()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker(registry):
+    """Return the process-wide inference worker for a loaded registry"""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = InferenceWorker(registry)
+    return _worker
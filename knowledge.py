@@ -0,0 +1,236 @@
+"""The agricultural knowledge base, loaded from data/knowledge_base.json.
+
+The file is parsed once per process into an immutable KnowledgeBase: read-only
+tables, cross-indexes (crop -> pests, pest -> crops, disease -> treatment,
+synonym -> canonical name), the compiled term matcher and pre-rendered answer
+text for the chat handlers and sidebar pages, including each crop's pests and
+diseases with their advice. Every AgriBot shares it.
+
+``get_knowledge_base()`` re-checks the file's mtime at most every
+AGRIBOT_KB_RELOAD_SECONDS and swaps in a new snapshot when it changed; a
+broken edit is reported and the previous snapshot kept.
+"""
+import json
+import os
+import re
+import threading
+import time
+from types import MappingProxyType
+
+import settings
+from term_matcher import build_matcher
+
+# Bump when the layout of knowledge_base.json changes incompatibly
+FORMAT_VERSION = 1
+
+CROP_FIELDS = ("season", "water", "soil", "fertilizer", "diseases", "pests", "usage")
+
+# Categories in the file, with the field holding each entry's advice text
+ADVICE_FIELDS = {"pests": "solution", "diseases": "treatment", "weather": "advice"}
+
+# Matcher category for each table
+MATCHER_CATEGORIES = {"crops": "crop", "pests": "pest", "diseases": "disease", "weather": "weather"}
+
+
+class KnowledgeBaseError(ValueError):
+    """The knowledge base file is missing, malformed or of another format version"""
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _canonical(name, names, synonyms):
+    """Known table entry that name refers to, by exact name, synonym or contained word"""
+    name = name.lower()
+    if name in names:
+        return name
+    if name in synonyms:
+        return synonyms[name]
+    for candidate in names:
+        if re.search(rf"\b{re.escape(candidate)}\b", name):
+            return candidate
+    return None
+
+
+class KnowledgeBase:
+    """Immutable snapshot of the knowledge base file"""
+
+    def __init__(self, data, path=None, mtime=None):
+        if not isinstance(data, dict) or data.get("version") != FORMAT_VERSION:
+            raise KnowledgeBaseError(f"expected knowledge base format version {FORMAT_VERSION}")
+        self.path = path
+        self.mtime = mtime
+        self.version = data["version"]
+
+        try:
+            crops = {name.lower(): {field: info[field] for field in CROP_FIELDS}
+                     for name, info in data["crops"].items()}
+            advice = {table: {name.lower(): entry[field] for name, entry in data[table].items()}
+                      for table, field in ADVICE_FIELDS.items()}
+            tips = list(data["farming_tips"])
+            synonyms = {
+                table: {synonym.lower(): name.lower()
+                        for name, entry in data[table].items() for synonym in entry.get("synonyms", ())}
+                for table in MATCHER_CATEGORIES
+            }
+        except (KeyError, TypeError, AttributeError) as e:
+            raise KnowledgeBaseError(f"malformed knowledge base: missing or invalid {e}") from None
+
+        self.crops_info = _freeze(crops)
+        self.pest_solutions = _freeze(advice["pests"])
+        self.disease_solutions = _freeze(advice["diseases"])
+        self.weather_advice = _freeze(advice["weather"])
+        self.farming_tips = tuple(tips)
+        self.synonyms = _freeze(synonyms)
+
+        # Cross-indexes, keyed on lowercase names
+        crop_pests, pest_crops, crop_diseases = {}, {}, {}
+        for crop, info in crops.items():
+            crop_pests[crop] = tuple(pest.lower() for pest in info["pests"])
+            crop_diseases[crop] = tuple(disease.lower() for disease in info["diseases"])
+            for pest in crop_pests[crop]:
+                pest = _canonical(pest, self.pest_solutions, synonyms["pests"]) or pest
+                pest_crops.setdefault(pest, []).append(crop)
+        self.crop_pests = _freeze(crop_pests)
+        self.crop_diseases = _freeze(crop_diseases)
+        self.pest_crops = _freeze(pest_crops)
+        # Every disease named anywhere -> treatment of the table entry it refers to
+        disease_names = set(self.disease_solutions) | {d for names in crop_diseases.values() for d in names}
+        self.disease_treatments = _freeze({
+            name: self.disease_solutions[canonical]
+            for name in sorted(disease_names)
+            for canonical in [_canonical(name, self.disease_solutions, synonyms["diseases"])]
+            if canonical
+        })
+
+        self.matcher = build_matcher(
+            crops=self.crops_info,
+            pests=self.pest_solutions,
+            diseases=self.disease_solutions,
+            weather=self.weather_advice,
+            synonyms=tuple((MATCHER_CATEGORIES[table], synonym, name)
+                           for table, table_synonyms in synonyms.items()
+                           for synonym, name in sorted(table_synonyms.items()))
+        )
+
+        self.crop_list = ", ".join(self.crops_info)
+        self.crop_answers = _freeze({crop: self._render_crop_answer(crop, info) for crop, info in crops.items()})
+        self.crop_pages = _freeze({crop: self._render_crop_page(crop, info) for crop, info in crops.items()})
+        self.pest_answers = _freeze({
+            pest: f"For {pest} management:\n{solution}\n\n"
+                  f"{self._render_pest_crops(pest)}"
+                  "Always follow integrated pest management practices for best results."
+            for pest, solution in self.pest_solutions.items()})
+        self.crop_pest_answers = _freeze({
+            crop: self._render_crop_issues(
+                f"Common pests of {crop}", pests,
+                lambda pest: self.pest_solutions.get(_canonical(pest, self.pest_solutions, synonyms["pests"])),
+                "Always follow integrated pest management practices for best results.")
+            for crop, pests in self.crop_pests.items()})
+        self.crop_disease_answers = _freeze({
+            crop: self._render_crop_issues(
+                f"Common diseases of {crop}", diseases, self.disease_treatments.get,
+                "Remember to follow label instructions and maintain proper sanitation.")
+            for crop, diseases in self.crop_diseases.items()})
+        self.disease_answers = _freeze({
+            disease: f"For {disease} management:\n{treatment}\n\n"
+                     "Remember to follow label instructions and maintain proper sanitation."
+            for disease, treatment in self.disease_solutions.items()})
+        self.weather_answers = _freeze({
+            weather: f"For {weather} weather conditions:\n{advice}\n\n"
+                     "Always monitor local weather forecasts for better planning."
+            for weather, advice in self.weather_advice.items()})
+
+    def _render_pest_crops(self, pest):
+        crops = self.pest_crops.get(pest)
+        return f"🌾 Crops it attacks: {', '.join(crops)}\n\n" if crops else ""
+
+    @staticmethod
+    def _render_crop_issues(title, names, advice_for, footer):
+        """One line per pest or disease of a crop, with its advice when the tables have some"""
+        lines = []
+        for name in names:
+            advice = advice_for(name)
+            lines.append(f"• {name}: {advice}" if advice else f"• {name}")
+        return f"{title}:\n" + "\n".join(lines) + f"\n\n{footer}"
+
+    @staticmethod
+    def _render_crop_answer(crop, info):
+        return (
+            f"Here's information about {crop.capitalize()}:\n\n"
+            f"🌱 Season: {info['season']}\n"
+            f"💧 Water needs: {info['water']}\n"
+            f"🌍 Soil requirements: {info['soil']}\n"
+            f"🧪 Fertilizer: {info['fertilizer']}\n"
+            f"🦠 Common diseases: {', '.join(info['diseases'])}\n"
+            f"🐛 Common pests: {', '.join(info['pests'])}\n"
+            f"🍽️ Usage: {info['usage']}\n"
+        )
+
+    @staticmethod
+    def _render_crop_page(crop, info):
+        """Markdown blocks for the Crop Info page's two columns"""
+        return {
+            "title": f"{crop.capitalize()} Details",
+            "details": (f"**Growing Season:** {info['season']}\n\n"
+                        f"**Water Requirements:** {info['water']}\n\n"
+                        f"**Soil Type:** {info['soil']}\n\n"
+                        f"**Fertilizer Recommendation:** {info['fertilizer']}"),
+            "issues": ("**Diseases:**\n" + "\n".join(f"- {disease}" for disease in info["diseases"]) +
+                       "\n\n**Pests:**\n" + "\n".join(f"- {pest}" for pest in info["pests"])),
+            "usage": info["usage"],
+        }
+
+
+def load_knowledge_base(path=None):
+    path = path or settings.KNOWLEDGE_BASE_PATH
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except OSError as e:
+        raise KnowledgeBaseError(f"cannot read knowledge base {path}: {e}") from None
+    except ValueError as e:
+        raise KnowledgeBaseError(f"knowledge base {path} is not valid JSON: {e}") from None
+    return KnowledgeBase(data, path, mtime)
+
+
+_knowledge_base = None
+_seen_mtime = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_knowledge_base():
+    """Return the process-wide knowledge base, reloading it if the file changed"""
+    global _knowledge_base, _seen_mtime, _checked_at
+    kb = _knowledge_base
+    interval = settings.KNOWLEDGE_BASE_RELOAD_SECONDS
+    now = time.monotonic()
+    if kb is not None and (interval <= 0 or now - _checked_at < interval):
+        return kb
+
+    with _lock:
+        if _knowledge_base is None:
+            _knowledge_base = load_knowledge_base()
+            _seen_mtime = _knowledge_base.mtime
+        elif now - _checked_at >= interval:
+            try:
+                mtime = os.stat(_knowledge_base.path).st_mtime_ns
+            except OSError:
+                mtime = _seen_mtime
+            if mtime != _seen_mtime:
+                # Remember the attempt so a broken edit is reported once, not on every check
+                _seen_mtime = mtime
+                try:
+                    _knowledge_base = load_knowledge_base(_knowledge_base.path)
+                    print(f"🔄 Reloaded knowledge base from {_knowledge_base.path}")
+                except KnowledgeBaseError as e:
+                    print(f"⚠️ Keeping the previous knowledge base ({e}).")
+        _checked_at = now
+        return _knowledge_base
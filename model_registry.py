@@ -0,0 +1,267 @@
+import copy
+import importlib.util
+import os
+import threading
+import time
+
+import model_snapshot
+import settings
+from prompts import build_prefix_caches
+
+# torch and transformers take seconds and hundreds of MB to import, so only
+# check that they are installed here; load() imports them on first use
+TRANSFORMERS_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ("transformers", "torch"))
+
+MODEL_ID = "microsoft/phi-3-mini-4k-instruct"
+
+# Load states reported by the registry
+IDLE = "idle"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+UNAVAILABLE = "unavailable"
+
+# Inference profiles: load dtype, whether linear layers get dynamic int8
+# quantization, and whether a configured draft model is used by default.
+# Float CPU decoding is memory-bandwidth bound, so verifying several drafted
+# tokens per pass pays off there; int8 and GPU fp16 are compute bound.
+PROFILES = {
+    "fp16": {"dtype": "float16", "quantize": False, "assisted": False},
+    "fp32": {"dtype": "float32", "quantize": False, "assisted": True},
+    "bf16": {"dtype": "bfloat16", "quantize": False, "assisted": True},
+    "int8": {"dtype": "float32", "quantize": True, "assisted": False},
+}
+
+
+def cpu_supports_bf16():
+    """True when the CPU has native bfloat16 matmuls (AVX512-BF16 or AMX)"""
+    import torch
+    checks = ("_is_amx_tile_supported", "_is_avx512_bf16_supported")
+    return any(getattr(torch.cpu, check, lambda: False)() for check in checks)
+
+
+def resolve_profile(profile, use_cuda):
+    """Map a requested profile (or "auto") to one the current hardware can run"""
+    if profile != "auto" and profile not in PROFILES:
+        raise ValueError(f"Unknown inference profile {profile!r}; choose from auto, {', '.join(PROFILES)}")
+    if use_cuda:
+        # Quantized and bf16 CPU kernels don't apply on GPU
+        return "fp16" if profile in ("auto", "int8", "bf16") else profile
+    if profile == "auto":
+        return "bf16" if cpu_supports_bf16() else "fp32"
+    if profile == "fp16":
+        return "fp32"
+    return profile
+
+
+class ModelRegistry:
+    """Process-wide owner of the tokenizer, model and text-generation pipeline.
+
+    Streamlit re-executes the app script on every rerun and for every browser
+    session, but imported modules stay in ``sys.modules``, so a registry living
+    here is loaded once per process and shared by every AgriBot instance.
+    """
+
+    def __init__(self, model_id=MODEL_ID, profile=settings.MODEL_PROFILE, threads=settings.TORCH_THREADS,
+                 draft_model_id=settings.DRAFT_MODEL_ID, assisted=settings.ASSISTED_DECODING):
+        self.model_id = model_id
+        self.draft_model_id = draft_model_id
+        self.assisted = assisted
+        self.requested_profile = profile
+        self.profile = None
+        self.threads = threads
+        # Snapshot directory or hub id the model was loaded from
+        self.source = None
+        self.state = self.initial_state()
+        self.error = None
+        self.load_seconds = None
+        self.tokenizer = None
+        # Copy of the tokenizer for session threads counting history tokens; a fast
+        # tokenizer's padding state changes with each call, so concurrent calls on the
+        # worker's instance fail with "Already borrowed"
+        self.history_tokenizer = None
+        self.model = None
+        self.generator = None
+        self.draft_tokenizer = None
+        self.draft_model = None
+        self.draft_shares_vocab = False
+        self.prefix_caches = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def initial_state():
+        """IDLE when the model can be loaded; UNAVAILABLE without the libraries or in KB-only mode"""
+        if settings.KB_ONLY or not TRANSFORMERS_AVAILABLE:
+            return UNAVAILABLE
+        return IDLE
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def load(self):
+        """Load the model once; concurrent callers wait for the first load"""
+        if self.state in (READY, FAILED, UNAVAILABLE):
+            return self.state
+
+        with self._lock:
+            # Another session may have finished loading while we waited
+            if self.state in (READY, FAILED, UNAVAILABLE):
+                return self.state
+
+            self.state = LOADING
+            started = time.perf_counter()
+            try:
+                if settings.OFFLINE:
+                    # Also keeps the hub client from trying the network for anything else
+                    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+                    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+                import torch
+                from transformers import pipeline
+
+                use_cuda = torch.cuda.is_available()
+                profile = resolve_profile(self.requested_profile, use_cuda)
+                options = PROFILES[profile]
+                if self.threads and not use_cuda:
+                    torch.set_num_threads(self.threads)
+                source = model_snapshot.resolve(self.model_id, profile)
+                tokenizer, model = self._load_model(source or self.model_id, options, use_cuda,
+                                                    local_only=source is not None)
+                generator = pipeline(
+                    "text-generation",
+                    model=model,
+                    tokenizer=tokenizer,
+                    device=0 if use_cuda else -1
+                )
+            except Exception as e:
+                self.error = str(e)
+                self.state = FAILED
+                print(f"⚠️ Could not load AI model ({e}).")
+            else:
+                self.tokenizer = tokenizer
+                self.history_tokenizer = copy.deepcopy(tokenizer)
+                self.model = model
+                self.generator = generator
+                self.source = source or self.model_id
+                self.prefix_caches = self._build_prefix_caches(tokenizer, model)
+                if self.assisted_enabled(profile):
+                    self._load_draft(profile, options, use_cuda)
+                self.profile = profile
+                self.threads = torch.get_num_threads()
+                self.error = None
+                self.state = READY
+            self.load_seconds = time.perf_counter() - started
+        return self.state
+
+    @staticmethod
+    def _load_model(model_id, options, use_cuda, local_only=False):
+        """Tokenizer and model from a hub id, or from a snapshot directory with local_only"""
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_id, local_files_only=local_only)
+        # A snapshot is already in the profile's dtype, so its safetensors are mapped without conversion
+        model = AutoModelForCausalLM.from_pretrained(
+            model_id,
+            torch_dtype=getattr(torch, options["dtype"]),
+            device_map="auto" if use_cuda else None,
+            local_files_only=local_only,
+            use_safetensors=True if local_only else None,
+            low_cpu_mem_usage=True
+        )
+        if options["quantize"]:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.eval()
+        return tokenizer, model
+
+    def assisted_enabled(self, profile):
+        """Whether to load the draft model for a resolved profile"""
+        if not self.draft_model_id or self.assisted == "off":
+            return False
+        return self.assisted == "on" or PROFILES[profile]["assisted"]
+
+    def _load_draft(self, profile, options, use_cuda):
+        """Load the draft model in the main model's profile; without it generation just isn't assisted"""
+        try:
+            source = model_snapshot.resolve(self.draft_model_id, profile)
+            tokenizer, model = self._load_model(source or self.draft_model_id, options, use_cuda,
+                                                local_only=source is not None)
+        except Exception as e:
+            print(f"⚠️ Could not load draft model {self.draft_model_id} ({e}). Decoding without it.")
+            return
+        model.generation_config.num_assistant_tokens = settings.DRAFT_TOKENS
+        self.draft_tokenizer = tokenizer
+        self.draft_model = model
+        self.draft_shares_vocab = tokenizer.get_vocab() == self.tokenizer.get_vocab()
+
+    def assistant_kwargs(self, sampling):
+        """Extra generate() arguments for assisted decoding of one request; empty when it is off.
+
+        With greedy sampling the reply is the one plain decoding would give.
+        A draft with its own tokenizer only assists greedy requests, the case
+        where that equivalence is guaranteed; passing both tokenizers to
+        generate() needs transformers 4.46 or later.
+        """
+        if self.draft_model is None:
+            return {}
+        if self.draft_shares_vocab:
+            return {"assistant_model": self.draft_model}
+        if sampling.get("do_sample"):
+            return {}
+        return {"assistant_model": self.draft_model, "tokenizer": self.tokenizer,
+                "assistant_tokenizer": self.draft_tokenizer}
+
+    def _build_prefix_caches(self, tokenizer, model):
+        if not settings.PREFIX_CACHE_ENABLED:
+            return {}
+        try:
+            return build_prefix_caches(tokenizer, model)
+        except Exception as e:
+            # Generation still works, it just prefills the full prompt
+            print(f"⚠️ Could not precompute prompt prefix caches ({e}).")
+            return {}
+
+    def reset(self):
+        """Drop the loaded objects so the next load() starts from scratch"""
+        with self._lock:
+            self.tokenizer = None
+            self.history_tokenizer = None
+            self.model = None
+            self.generator = None
+            self.draft_tokenizer = None
+            self.draft_model = None
+            self.draft_shares_vocab = False
+            self.prefix_caches = {}
+            self.error = None
+            self.load_seconds = None
+            self.profile = None
+            self.source = None
+            self.state = self.initial_state()
+
+    def status(self):
+        return {
+            "model_id": self.model_id,
+            "state": self.state,
+            "mode": settings.MODE,
+            "source": self.source,
+            "offline": settings.OFFLINE,
+            "profile": self.profile or self.requested_profile,
+            "threads": self.threads,
+            "draft_model": self.draft_model_id if self.draft_model is not None else None,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide model registry, creating it on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
@@ -0,0 +1,163 @@
+"""Local, offline-loadable model snapshots.
+
+``from_pretrained`` with a hub id fetches the weights over the network on a
+fresh node, and any dtype other than the stored one is converted after they
+are read. A snapshot is prepared once on a connected machine, per inference
+profile: the model is saved as safetensors already in that profile's dtype,
+next to its tokenizer and a small manifest. Loading it memory-maps the
+safetensors files with nothing to download or convert, so cold start is
+bounded by disk speed. Copy ``models/`` to field nodes and set
+``AGRIBOT_OFFLINE=1`` to make a missing snapshot an error instead of a
+download.
+
+    python model_snapshot.py prepare --profile bf16 [--draft <draft model id>]
+    python model_snapshot.py status
+
+The int8 profile quantizes with torch's dynamic quantization, whose packed
+weights have no safetensors form, so its snapshot holds float32 weights and
+quantizes them as it loads.
+"""
+import json
+import os
+import shutil
+import sys
+import time
+
+import settings
+
+MANIFEST = "agribot_snapshot.json"
+FORMAT_VERSION = 1
+
+
+class SnapshotError(RuntimeError):
+    """A model snapshot is missing, incomplete or was prepared for something else"""
+
+
+def snapshot_path(model_id, profile):
+    """Directory holding the snapshot of model_id for a resolved profile"""
+    return os.path.join(settings.MODEL_DIR, f"{model_id.rstrip('/').split('/')[-1]}-{profile}")
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except OSError:
+        return None
+    except ValueError as e:
+        raise SnapshotError(f"snapshot manifest in {path} is not valid JSON: {e}") from None
+    if manifest.get("version") != FORMAT_VERSION:
+        raise SnapshotError(f"snapshot in {path} has format version {manifest.get('version')!r}, "
+                            f"expected {FORMAT_VERSION}; prepare it again")
+    return manifest
+
+
+def resolve(model_id, profile):
+    """Local snapshot directory for model_id, or None to load from the hub.
+
+    Raises SnapshotError in offline mode when there is no usable snapshot.
+    """
+    path = snapshot_path(model_id, profile)
+    manifest = read_manifest(path)
+    if manifest is not None:
+        if manifest["model_id"] != model_id or manifest["profile"] != profile:
+            raise SnapshotError(f"snapshot in {path} was prepared for {manifest['model_id']} "
+                                f"({manifest['profile']}), not {model_id} ({profile})")
+        return path
+    if settings.OFFLINE:
+        raise SnapshotError(
+            f"no snapshot of {model_id} for the {profile} profile in {path} and AGRIBOT_OFFLINE is set; "
+            f"run `python model_snapshot.py prepare --profile {profile}` on a connected machine "
+            f"and copy {settings.MODEL_DIR} here")
+    return None
+
+
+def prepare(model_id, profile, force=False):
+    """Download model_id and write its snapshot for a resolved profile; returns the directory"""
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    from model_registry import PROFILES
+
+    path = snapshot_path(model_id, profile)
+    if not force and read_manifest(path) is not None:
+        print(f"✅ {path} already exists (use --force to rebuild it)")
+        return path
+
+    options = PROFILES[profile]
+    started = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=getattr(torch, options["dtype"]),
+                                                 low_cpu_mem_usage=True)
+
+    # Written beside the target and renamed into place, so a failed run never leaves a half snapshot
+    staging = path + ".partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    model.save_pretrained(staging, safe_serialization=True)
+    tokenizer.save_pretrained(staging)
+    files = sorted(os.listdir(staging))
+    manifest = {
+        "version": FORMAT_VERSION,
+        "model_id": model_id,
+        "profile": profile,
+        "dtype": options["dtype"],
+        "quantize_on_load": options["quantize"],
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "bytes": sum(os.path.getsize(os.path.join(staging, name)) for name in files),
+        "files": files,
+    }
+    with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(staging, path)
+    print(f"✅ Wrote {path} ({manifest['bytes'] / 2**30:.2f} GiB, {options['dtype']}) "
+          f"in {time.perf_counter() - started:.0f}s")
+    return path
+
+
+def main(argv=None):
+    import argparse
+
+    from model_registry import MODEL_ID, PROFILES, resolve_profile
+
+    parser = argparse.ArgumentParser(description="Prepare or inspect offline model snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("prepare", help="download a model and write its snapshot under the model directory")
+    build.add_argument("--model", default=MODEL_ID)
+    build.add_argument("--profile", nargs="+", default=[settings.MODEL_PROFILE],
+                       help=f"auto (this machine's choice) or any of {', '.join(PROFILES)}")
+    build.add_argument("--draft", default=settings.DRAFT_MODEL_ID,
+                       help="also snapshot this draft model for assisted decoding")
+    build.add_argument("--force", action="store_true", help="rebuild existing snapshots")
+    sub.add_parser("status", help="list the snapshots in the model directory")
+    args = parser.parse_args(argv)
+
+    if args.command == "prepare":
+        import torch
+
+        for profile in args.profile:
+            profile = resolve_profile(profile, torch.cuda.is_available())
+            for model_id in filter(None, (args.model, args.draft)):
+                prepare(model_id, profile, force=args.force)
+        return
+
+    names = sorted(os.listdir(settings.MODEL_DIR)) if os.path.isdir(settings.MODEL_DIR) else []
+    found = False
+    for name in names:
+        path = os.path.join(settings.MODEL_DIR, name)
+        try:
+            manifest = read_manifest(path)
+        except SnapshotError as e:
+            print(f"⚠️ {e}")
+            continue
+        if manifest is not None:
+            found = True
+            print(f"{name:40} {manifest['model_id']:40} {manifest['dtype']:9} "
+                  f"{manifest['bytes'] / 2**30:6.2f} GiB  {manifest['created']}")
+    if not found:
+        print(f"No snapshots in {settings.MODEL_DIR}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
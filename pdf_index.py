@@ -0,0 +1,386 @@
+"""BM25 retrieval over the agronomy PDFs shipped in data/.
+
+The index is built once from page- and paragraph-level chunks, taken from the
+``pdf_ingest`` page cache, and written to disk as a handful of flat binary
+arrays plus a small JSON header. Loading maps the arrays with ``mmap`` so
+startup never re-parses the PDFs. Each build gets its own subdirectory and a
+``CURRENT`` file names the live one, so a rebuild never rewrites files that
+a running index has mapped.
+
+Build or refresh it from the command line with::
+
+    python pdf_index.py build
+    python pdf_index.py search "leaf curl on tomato"
+"""
+import heapq
+import importlib.util
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+# pypdf is only needed to (re)build the index, so it is imported on first use
+PYPDF_AVAILABLE = importlib.util.find_spec("pypdf") is not None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+INDEX_DIR = os.path.join(BASE_DIR, "index", "bm25")
+
+FORMAT_VERSION = 1
+# File in INDEX_DIR naming the subdirectory that holds the live index
+CURRENT = "CURRENT"
+K1 = 1.5
+B = 0.75
+
+# Chunks are paragraphs merged until they reach roughly this many words
+CHUNK_WORDS = 120
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do for from has have how i if in into is it its
+me my of on or our should so that the their them then there these they this
+to was we what when where which while who why will with you your
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords dropped and plurals folded"""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def split_paragraphs(page_text):
+    """Split one page into chunks of whole paragraphs near CHUNK_WORDS words"""
+    paragraphs = [re.sub(r"\s+", " ", p).strip() for p in re.split(r"\n\s*\n", page_text)]
+    chunks, current, words = [], [], 0
+    for paragraph in paragraphs:
+        if not paragraph:
+            continue
+        current.append(paragraph)
+        words += len(paragraph.split())
+        if words >= CHUNK_WORDS:
+            chunks.append(" ".join(current))
+            current, words = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def list_pdfs(data_dir=DATA_DIR):
+    if not os.path.isdir(data_dir):
+        return []
+    return sorted(name for name in os.listdir(data_dir) if name.lower().endswith(".pdf"))
+
+
+def source_fingerprint(data_dir=DATA_DIR):
+    """Size and mtime of every PDF, used to detect a stale index"""
+    fingerprint = {}
+    for name in list_pdfs(data_dir):
+        stat = os.stat(os.path.join(data_dir, name))
+        fingerprint[name] = [stat.st_size, int(stat.st_mtime)]
+    return fingerprint
+
+
+def extract_chunks(data_dir=DATA_DIR):
+    """Yield (document, page number, text) for every chunk in data_dir.
+
+    Text comes from the page cache, which extracts new or changed PDFs first.
+    """
+    from pdf_ingest import ingest, iter_chunks
+
+    manifest, _ = ingest(data_dir)
+    yield from iter_chunks(manifest)
+
+
+def current_dir(index_dir=INDEX_DIR):
+    """Directory of the live index under index_dir, or None when none was built"""
+    try:
+        with open(os.path.join(index_dir, CURRENT), encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(index_dir, name) if name else None
+
+
+def build_index(chunks, index_dir=INDEX_DIR, fingerprint=None):
+    """Write a BM25 index for (document, page, text) chunks to index_dir.
+
+    Every build goes to a new subdirectory and becomes live only when the
+    CURRENT pointer is replaced, so an index that is mapped and serving
+    questions never sees its files rewritten.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    previous = current_dir(index_dir)
+    build_dir = tempfile.mkdtemp(prefix="v-", dir=index_dir)
+    try:
+        _write_index(chunks, build_dir, fingerprint)
+        tmp_path = os.path.join(index_dir, CURRENT + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(os.path.basename(build_dir))
+        os.replace(tmp_path, os.path.join(index_dir, CURRENT))
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    # The previous build stays for readers that resolved CURRENT just before the switch;
+    # older ones go. Open maps of a removed build keep working until they are closed.
+    keep = {os.path.basename(build_dir), os.path.basename(previous or "")}
+    for name in os.listdir(index_dir):
+        path = os.path.join(index_dir, name)
+        if name not in keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+    return BM25Index(index_dir)
+
+
+def _write_index(chunks, index_dir, fingerprint):
+    postings = defaultdict(list)
+    doc_lengths = array("I")
+    sources = []
+    text_offsets = array("Q", [0])
+
+    with open(os.path.join(index_dir, "texts.bin"), "wb") as texts:
+        for chunk_id, (document, page, text) in enumerate(chunks):
+            tokens = tokenize(text)
+            for term, tf in Counter(tokens).items():
+                postings[term].append((chunk_id, min(tf, 0xFFFF)))
+            doc_lengths.append(len(tokens))
+            sources.append([document, page])
+            encoded = text.encode("utf-8")
+            texts.write(encoded)
+            text_offsets.append(text_offsets[-1] + len(encoded))
+
+    vocabulary = {}
+    chunk_ids = array("I")
+    term_freqs = array("H")
+    for term in sorted(postings):
+        entries = postings[term]
+        vocabulary[term] = [len(chunk_ids), len(entries)]
+        for chunk_id, tf in entries:
+            chunk_ids.append(chunk_id)
+            term_freqs.append(tf)
+
+    for filename, values in (("postings.bin", chunk_ids), ("tfs.bin", term_freqs),
+                             ("doclens.bin", doc_lengths), ("offsets.bin", text_offsets)):
+        with open(os.path.join(index_dir, filename), "wb") as f:
+            values.tofile(f)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "k1": K1,
+        "b": B,
+        "chunks": len(doc_lengths),
+        "avgdl": (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0,
+        "sources": sources,
+        "fingerprint": fingerprint or {},
+        "vocabulary": vocabulary,
+    }
+    with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, separators=(",", ":"))
+
+
+def _map_array(path, typecode):
+    """Memory-map a flat binary file as a typed memoryview"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return None, memoryview(array(typecode))
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return mapped, memoryview(mapped).cast(typecode)
+
+
+class BM25Index:
+    """Read-only BM25 index backed by memory-mapped arrays"""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        # The build CURRENT names when this index was opened; later builds never touch it
+        self.index_dir = current_dir(index_dir)
+        if self.index_dir is None:
+            raise FileNotFoundError(f"No document index in {index_dir}; build it with 'python pdf_index.py build'")
+        with open(os.path.join(self.index_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION or meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"Incompatible index in {index_dir}; rebuild it with 'python pdf_index.py build'")
+
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self.sources = meta["sources"]
+        self.fingerprint = meta["fingerprint"]
+        self.vocabulary = meta["vocabulary"]
+        self.size = meta["chunks"]
+
+        self._maps = []
+        self.postings = self._open("postings.bin", "I")
+        self.term_freqs = self._open("tfs.bin", "H")
+        self.doc_lengths = self._open("doclens.bin", "I")
+        self.text_offsets = self._open("offsets.bin", "Q")
+        self.texts = self._open("texts.bin", "B")
+
+    def _open(self, filename, typecode):
+        mapped, view = _map_array(os.path.join(self.index_dir, filename), typecode)
+        if mapped is not None:
+            self._maps.append(mapped)
+        return view
+
+    def idf(self, df):
+        return math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+
+    def text(self, chunk_id):
+        start, end = self.text_offsets[chunk_id], self.text_offsets[chunk_id + 1]
+        return bytes(self.texts[start:end]).decode("utf-8")
+
+    def search(self, query, top_k=3):
+        """Return up to top_k (score, document, page, text) tuples for query"""
+        scores = defaultdict(float)
+        k1, b, avgdl = self.k1, self.b, self.avgdl
+        for term in set(tokenize(query)):
+            entry = self.vocabulary.get(term)
+            if not entry:
+                continue
+            offset, df = entry
+            idf = self.idf(df)
+            for i in range(offset, offset + df):
+                chunk_id = self.postings[i]
+                tf = self.term_freqs[i]
+                norm = k1 * (1 - b + b * self.doc_lengths[chunk_id] / avgdl)
+                scores[chunk_id] += idf * tf * (k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(score, *self.sources[chunk_id], self.text(chunk_id)) for chunk_id, score in best]
+
+    def close(self):
+        for view in (self.postings, self.term_freqs, self.doc_lengths, self.text_offsets, self.texts):
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+
+def open_index(data_dir=DATA_DIR, index_dir=INDEX_DIR):
+    """Open the on-disk index without building it; None when there is none.
+
+    A stale index is still served, with a warning, until a rebuild replaces it.
+    """
+    if current_dir(index_dir) is None:
+        return None
+    index = BM25Index(index_dir)
+    if index.fingerprint != source_fingerprint(data_dir):
+        print("⚠️ Document index is out of date with data/; run 'python pdf_index.py build'.")
+    return index
+
+
+def load_or_build(data_dir=DATA_DIR, index_dir=INDEX_DIR):
+    """Open the on-disk index, rebuilding it only when the PDFs changed"""
+    fingerprint = source_fingerprint(data_dir)
+    if current_dir(index_dir) is not None:
+        try:
+            index = BM25Index(index_dir)
+            if index.fingerprint == fingerprint:
+                return index
+            index.close()
+        except ValueError as e:
+            print(f"⚠️ {e}")
+    if not fingerprint or not PYPDF_AVAILABLE:
+        return None
+    print("📚 Building document index from data/ ...")
+    return build_index(extract_chunks(data_dir), index_dir, fingerprint)
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+_preload_started = False
+
+
+def get_index():
+    """Return the process-wide document index, or None when unavailable.
+
+    Only opens what is on disk; building is left to preload_index() and the
+    command line, so no question waits for PDF extraction.
+    """
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                try:
+                    _index = open_index()
+                except Exception as e:
+                    print(f"⚠️ Could not load document index ({e}).")
+                    _index = None
+                _index_loaded = True
+    return _index
+
+
+def _refresh_index():
+    global _index, _index_loaded
+    try:
+        index = load_or_build()
+    except Exception as e:
+        print(f"⚠️ Could not build document index ({e}).")
+        return
+    # Questions keep using the index they already hold; new ones get the fresh one
+    with _index_lock:
+        _index, _index_loaded = index, True
+
+
+def preload_index():
+    """Open the document index in a background thread, first rebuilding it if the PDFs changed"""
+    global _preload_started
+    if not _preload_started:
+        _preload_started = True
+        threading.Thread(target=_refresh_index, name="agribot-index", daemon=True).start()
+
+
+def format_passages(hits, max_chars=600):
+    """Render search hits as numbered reference passages for a prompt"""
+    lines = []
+    for number, (_, document, page, text) in enumerate(hits, start=1):
+        if len(text) > max_chars:
+            text = text[:max_chars].rsplit(" ", 1)[0] + " ..."
+        lines.append(f"[{number}] ({document}, p.{page}) {text}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build or query the AgriBot PDF index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="(re)build the index from data/")
+    search = sub.add_parser("search", help="run a query against the index")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        started = time.perf_counter()
+        index = build_index(extract_chunks(), INDEX_DIR, source_fingerprint())
+        print(f"Indexed {index.size} chunks, {len(index.vocabulary)} terms "
+              f"in {time.perf_counter() - started:.1f}s -> {INDEX_DIR}")
+    else:
+        index = BM25Index(INDEX_DIR)
+        started = time.perf_counter()
+        hits = index.search(args.query, top_k=args.k)
+        elapsed = (time.perf_counter() - started) * 1000
+        for score, document, page, text in hits:
+            print(f"{score:6.2f}  {document} p.{page}: {text[:160]}")
+        print(f"({elapsed:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""Parallel, incremental text extraction from the PDFs in data/.
+
+Every PDF is split into page ranges that a process pool extracts and chunks
+in parallel; results are consumed in page order and streamed straight to one
+JSON-lines file per document under ``index/pages/``, one line per page, so
+memory stays flat however many documents there are. A manifest records the
+SHA-256 of every file and of every page's content streams:
+
+- an unchanged file (same hash) is not opened at all
+- in a changed file, pages whose content hash is already known reuse their
+  cached chunks and only new or edited pages are extracted again
+- removed files are dropped from the cache
+
+The BM25 and vector indexes read their chunks from here.
+
+    python pdf_ingest.py [--workers 4] [--force]
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import settings
+from pdf_index import BASE_DIR, CHUNK_WORDS, DATA_DIR, PYPDF_AVAILABLE, list_pdfs, split_paragraphs
+
+INGEST_DIR = os.path.join(BASE_DIR, "index", "pages")
+MANIFEST = "manifest.json"
+
+FORMAT_VERSION = 1
+# Pages handed to a worker at a time; each task reopens the PDF at most once per worker
+PAGES_PER_TASK = 8
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def page_sha256(page):
+    """Hash of a page's decoded content streams, the drawing operators its text comes from"""
+    digest = hashlib.sha256()
+    contents = page.get("/Contents")
+    contents = contents.get_object() if contents is not None else []
+    for stream in contents if isinstance(contents, list) else [contents]:
+        digest.update(stream.get_object().get_data())
+    return digest.hexdigest()
+
+
+def _init_worker():
+    # Damaged PDFs make pypdf log a warning per object; failed pages are counted instead
+    logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+
+# Worker-local reader of the file this process extracted from last
+_reader = None
+
+
+def _open_reader(path, sha256):
+    global _reader
+    if _reader is None or _reader[0] != (path, sha256):
+        from pypdf import PdfReader
+
+        _reader = ((path, sha256), PdfReader(path))
+    return _reader[1]
+
+
+def count_pages(path, sha256):
+    """Number of pages in a PDF, or the error that kept it from opening"""
+    try:
+        return len(_open_reader(path, sha256).pages), None
+    except Exception as e:
+        return 0, str(e)
+
+
+def extract_pages(path, sha256, start, stop, known):
+    """[page number, page hash, chunks] for pages start..stop-1 of one PDF.
+
+    Pages whose hash is in known come back with chunks None for the caller
+    to copy from its cache; a page that cannot be read has hash None and no
+    chunks.
+    """
+    pages = _open_reader(path, sha256).pages
+    results = []
+    for number in range(start, stop):
+        try:
+            page = pages[number]
+            digest = page_sha256(page)
+            chunks = None if digest in known else split_paragraphs(page.extract_text() or "")
+        except Exception:
+            digest, chunks = None, []
+        results.append([number + 1, digest, chunks])
+    return results
+
+
+def _completed(fn, *args):
+    """Run fn inline and wrap its result like an executor would"""
+    future = Future()
+    future.set_result(fn(*args))
+    return future
+
+
+def read_manifest(ingest_dir=INGEST_DIR):
+    try:
+        with open(os.path.join(ingest_dir, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != FORMAT_VERSION or manifest.get("chunk_words") != CHUNK_WORDS:
+        return None
+    return manifest
+
+
+def _write_manifest(manifest, ingest_dir):
+    tmp_path = os.path.join(ingest_dir, MANIFEST + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp_path, os.path.join(ingest_dir, MANIFEST))
+
+
+def _pages_path(name, ingest_dir):
+    return os.path.join(ingest_dir, name + ".jsonl")
+
+
+def _page_offsets(path):
+    """Byte offset of every cached page line keyed by page hash; empty when there is no cache"""
+    offsets = {}
+    try:
+        with open(path, "rb") as f:
+            offset = 0
+            for line in f:
+                digest = json.loads(line)["sha256"]
+                if digest:
+                    offsets.setdefault(digest, offset)
+                offset += len(line)
+    except OSError:
+        pass
+    return offsets
+
+
+def _cached_chunks(f, offset):
+    f.seek(offset)
+    return json.loads(f.readline())["chunks"]
+
+
+class _DocumentWriter:
+    """Streams one document's pages to a partial file, copying known pages from its old cache"""
+
+    def __init__(self, name, entry, ingest_dir, reuse=True):
+        self.name = name
+        self.entry = entry
+        self.path = _pages_path(name, ingest_dir)
+        self.cached = _page_offsets(self.path) if reuse else {}
+        self.old = open(self.path, "rb") if self.cached else None
+        self.out = open(self.path + ".partial", "w", encoding="utf-8")
+        self.reused = 0
+
+    def write(self, number, digest, chunks):
+        if chunks is None:
+            chunks = _cached_chunks(self.old, self.cached[digest])
+            self.reused += 1
+        if digest is None:
+            self.entry["failed_pages"] += 1
+        self.entry["pages"].append(digest)
+        self.entry["chunks"] += len(chunks)
+        self.out.write(json.dumps({"page": number, "sha256": digest, "chunks": chunks}, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.out.close()
+        if self.old is not None:
+            self.old.close()
+        os.replace(self.path + ".partial", self.path)
+        failed = self.entry["failed_pages"]
+        print(f"📄 {self.name}: {len(self.entry['pages'])} pages, {self.entry['chunks']} chunks"
+              f"{f', {self.reused} pages reused' if self.reused else ''}"
+              f"{f', {failed} unreadable' if failed else ''}")
+
+
+def ingest(data_dir=DATA_DIR, ingest_dir=INGEST_DIR, workers=settings.INGEST_WORKERS, force=False):
+    """Bring the page cache up to date with data_dir.
+
+    Returns the manifest and the names of the documents that were read
+    again. The manifest is rewritten after every finished document, so an
+    interrupted run keeps what it had done.
+    """
+    global _reader
+    os.makedirs(ingest_dir, exist_ok=True)
+    previous = None if force else read_manifest(ingest_dir)
+    old_files = previous["files"] if previous else {}
+    manifest = {"version": FORMAT_VERSION, "chunk_words": CHUNK_WORDS, "files": {}}
+
+    names = list_pdfs(data_dir)
+    changed = []
+    for name in names:
+        path = os.path.join(data_dir, name)
+        stat = os.stat(path)
+        old = old_files.get(name)
+        # Like git's index, an unchanged size and mtime vouch for the recorded hash
+        if old and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+            sha = old["sha256"]
+        else:
+            sha = file_sha256(path)
+        if old and old["sha256"] == sha and os.path.exists(_pages_path(name, ingest_dir)):
+            manifest["files"][name] = dict(old, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        else:
+            changed.append((name, path, sha, stat))
+
+    for name in set(old_files) - set(names):
+        try:
+            os.remove(_pages_path(name, ingest_dir))
+        except OSError:
+            pass
+    _write_manifest(manifest, ingest_dir)
+    if not changed:
+        return manifest, []
+    if not PYPDF_AVAILABLE:
+        raise RuntimeError("pypdf is required to read the PDFs in data/ (pip install pypdf)")
+
+    workers = workers or os.cpu_count() or 1
+    # Spawned, not forked: ingest can run inside a threaded server that holds the model
+    pool = (ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                mp_context=multiprocessing.get_context("spawn"))
+            if workers > 1 else None)
+    if pool is None:
+        _init_worker()
+    submit = pool.submit if pool is not None else _completed
+    processed = []
+
+    def tasks():
+        counts = [submit(count_pages, path, sha) for _, path, sha, _ in changed]
+        for (name, path, sha, stat), count in zip(changed, counts):
+            pages, error = count.result()
+            if error:
+                # Left out of the manifest, so the next run tries it again
+                print(f"⚠️ Could not read {name} ({error}).")
+                continue
+            entry = {"sha256": sha, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                     "pages": [], "chunks": 0, "failed_pages": 0}
+            # Without a valid manifest the cached chunks may come from another chunk size
+            writer = _DocumentWriter(name, entry, ingest_dir, reuse=previous is not None)
+            known = frozenset(writer.cached)
+            for start in range(0, pages, PAGES_PER_TASK):
+                yield writer, submit(extract_pages, path, sha, start, min(start + PAGES_PER_TASK, pages), known)
+            yield writer, None
+
+    def finish(writer, future):
+        if future is not None:
+            for page in future.result():
+                writer.write(*page)
+            return
+        writer.close()
+        manifest["files"][writer.name] = writer.entry
+        _write_manifest(manifest, ingest_dir)
+        processed.append(writer.name)
+
+    try:
+        # A couple of tasks per worker in flight: enough to keep them busy, few enough to keep memory flat
+        pending = deque()
+        for task in tasks():
+            pending.append(task)
+            while len(pending) > 2 * workers:
+                finish(*pending.popleft())
+        while pending:
+            finish(*pending.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        _reader = None
+
+    manifest["files"] = {name: manifest["files"][name] for name in names if name in manifest["files"]}
+    _write_manifest(manifest, ingest_dir)
+    return manifest, processed
+
+
+def iter_document(name, ingest_dir=INGEST_DIR):
+    """Yield (page number, text) for every cached chunk of one document"""
+    with open(_pages_path(name, ingest_dir), encoding="utf-8") as f:
+        for line in f:
+            page = json.loads(line)
+            for text in page["chunks"]:
+                yield page["page"], text
+
+
+def iter_chunks(manifest, ingest_dir=INGEST_DIR):
+    """Yield (document, page number, text) for every cached chunk, document by document"""
+    for name in manifest["files"]:
+        for page, text in iter_document(name, ingest_dir):
+            yield name, page, text
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Extract and chunk the PDFs in data/ into the page cache")
+    parser.add_argument("--workers", type=int, default=settings.INGEST_WORKERS,
+                        help="extraction processes (0 = one per CPU, 1 = no pool)")
+    parser.add_argument("--force", action="store_true", help="re-extract every page")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    manifest, processed = ingest(workers=args.workers, force=args.force)
+    files = manifest["files"].values()
+    print(f"{len(manifest['files'])} documents, {sum(len(entry['pages']) for entry in files)} pages, "
+          f"{sum(entry['chunks'] for entry in files)} chunks in {time.perf_counter() - started:.1f}s; "
+          f"read: {', '.join(processed) or 'none'} -> {INGEST_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Prompt templates for every AI handler, with reusable prefix KV caches.
+
+Each template is a fixed instruction prefix followed by a per-request body.
+Once the model is loaded, the attention key/value cache for every registered
+prefix is computed a single time; requests then only prefill their own body
+on top of a copy of that cache. Register new templates here so other
+handlers get the same saving.
+"""
+import collections
+import copy
+
+TEMPLATES = {}
+
+
+class RenderedPrompt:
+    """A template filled in for one request; str() gives the full prompt text"""
+    __slots__ = ("template", "suffix")
+
+    def __init__(self, template, suffix):
+        self.template = template
+        self.suffix = suffix
+
+    @property
+    def text(self):
+        return self.template.prefix + self.suffix
+
+    def __str__(self):
+        return self.text
+
+
+class PromptTemplate:
+    def __init__(self, name, prefix, body):
+        self.name = name
+        self.prefix = prefix
+        self.body = body
+
+    def render(self, **fields):
+        return RenderedPrompt(self, self.body.format(**fields))
+
+
+def register_template(name, prefix, body):
+    """Add a template to the registry so its prefix cache is built at load time"""
+    template = PromptTemplate(name, prefix, body)
+    TEMPLATES[name] = template
+    return template
+
+
+EXPERT_ANSWER = register_template(
+    "expert_answer",
+    prefix="""<|user|>
+As an agricultural expert, answer the farming question below in detail.
+Provide practical, actionable advice suitable for farmers.
+Include relevant examples if possible.
+""",
+    body="""{history}{context}Question: {message}
+<|assistant|>
+""")
+
+USAGE_GUIDE = register_template(
+    "usage_guide",
+    prefix="""<|user|>
+As an agricultural expert, provide detailed step-by-step instructions for the request below.
+Include planting, growing, harvesting, and usage information for the crop.
+Make the response practical and suitable for farmers.
+""",
+    body="""{history}{context}Crop: {crop}
+Request: {message}
+<|assistant|>
+""")
+
+
+def split_prompt_ids(prefix_ids, rows):
+    """Suffix ids of every tokenized full prompt in rows, or None unless all start with prefix_ids.
+
+    Tokenizers may merge across the prefix/body boundary (a leading-space or
+    newline merge), so the body's ids are cut from the whole prompt's, never
+    tokenized on their own; a prompt that doesn't split cleanly can't use the
+    cache.
+    """
+    length = len(prefix_ids)
+    suffixes = []
+    for row in rows:
+        if len(row) <= length or row[:length] != prefix_ids:
+            return None
+        suffixes.append(row[length:])
+    return suffixes
+
+
+class PrefixCache:
+    """Token ids and past key/values of one template's fixed prefix"""
+
+    def __init__(self, input_ids, past_key_values):
+        self.input_ids = input_ids
+        self.ids = input_ids[0].tolist()
+        self.past_key_values = past_key_values
+
+    @property
+    def length(self):
+        return self.input_ids.shape[1]
+
+    def split(self, rows):
+        return split_prompt_ids(self.ids, rows)
+
+    def copy_for_batch(self, batch_size):
+        """Private copy of the cache, since generate() appends to it in place"""
+        cache = copy.deepcopy(self.past_key_values)
+        if batch_size > 1:
+            cache.batch_repeat_interleave(batch_size)
+        return cache
+
+
+def build_prefix_caches(tokenizer, model):
+    """Prefill every registered template prefix once and keep its KV cache"""
+    import torch
+    from transformers import DynamicCache
+
+    caches = {}
+    for name, template in TEMPLATES.items():
+        input_ids = tokenizer(template.prefix, return_tensors="pt")["input_ids"].to(model.device)
+        # A body merging into the prefix's last token would make every request miss the cache
+        sample = template.body.format_map(collections.defaultdict(lambda: "x"))
+        if split_prompt_ids(input_ids[0].tolist(), [tokenizer(template.prefix + sample)["input_ids"]]) is None:
+            print(f"⚠️ Prompt prefix of {name} does not end on a token boundary; not caching it.")
+            continue
+        cache = DynamicCache()
+        with torch.inference_mode():
+            model(input_ids=input_ids, past_key_values=cache, use_cache=True)
+        caches[name] = PrefixCache(input_ids, cache)
+    return caches
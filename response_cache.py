@@ -0,0 +1,192 @@
+"""Persistent cache for AI-generated answers.
+
+Entries are keyed on the normalized question plus the detected intent and
+crop, stored in SQLite so they survive restarts, and evicted by age (TTL) and
+by least-recent use once the table grows past its size limit. An optional
+near-duplicate lookup reuses the answer to an almost identical question.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import settings
+from pdf_index import TOKEN_RE, tokenize
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+# Words that change what a question asks; near-duplicates must share exactly the same ones.
+# "t" is what is left of "n't" once punctuation is stripped ("don t", "can t")
+CUE_WORDS = frozenset("how what when where which who whose why not no never nor without cannot t".split())
+# Also compared, although document search drops them as stopwords
+MODAL_WORDS = frozenset(("can", "should", "will"))
+
+# Only this many recent candidates are compared for near-duplicates
+NEAR_DUPLICATE_CANDIDATES = 500
+
+
+def normalize_query(text):
+    """Lowercase, strip punctuation and collapse whitespace"""
+    text = PUNCTUATION_RE.sub(" ", text.lower())
+    return " ".join(text.split())
+
+
+def question_words(text):
+    """Content words of a normalized question, keeping its question words, modals and negations"""
+    return set(tokenize(text)) | (set(TOKEN_RE.findall(text)) & (CUE_WORDS | MODAL_WORDS))
+
+
+def similarity(a, b):
+    """Jaccard overlap of the words of two normalized questions.
+
+    Questions with different question words or negations score 0: "when
+    should I sow wheat" and "how should I sow wheat" share everything else.
+    """
+    a, b = question_words(a), question_words(b)
+    if not a or not b or a & CUE_WORDS != b & CUE_WORDS:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ResponseCache:
+    """SQLite-backed answer cache with LRU/TTL eviction and hit counters"""
+
+    def __init__(self, path=settings.CACHE_PATH, max_entries=settings.CACHE_MAX_ENTRIES,
+                 ttl_seconds=settings.CACHE_TTL_SECONDS, near_duplicates=settings.CACHE_NEAR_DUPLICATES,
+                 near_duplicate_threshold=settings.CACHE_NEAR_DUPLICATE_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.near_duplicates = near_duplicates
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                intent TEXT NOT NULL,
+                crop TEXT NOT NULL,
+                query TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (intent, crop, accessed)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(query, intent, crop):
+        return f"{intent}|{crop or ''}|{query}"
+
+    def get(self, message, intent="general", crop=None):
+        """Return a cached answer for message, or None"""
+        query = normalize_query(message)
+        crop = crop or ""
+        now = time.time()
+        expired_before = now - self.ttl_seconds
+        with self._lock:
+            row = self._db.execute(
+                "SELECT key, answer, created FROM answers WHERE key = ?",
+                (self.make_key(query, intent, crop),)).fetchone()
+            if row and row[2] < expired_before:
+                self._db.execute("DELETE FROM answers WHERE key = ?", (row[0],))
+                self._db.commit()
+                self.evictions += 1
+                row = None
+
+            if row is None and self.near_duplicates:
+                row = self._find_near_duplicate(query, intent, crop, expired_before)
+                if row:
+                    self.near_hits += 1
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._db.execute("UPDATE answers SET accessed = ? WHERE key = ?", (now, row[0]))
+            self._db.commit()
+            return row[1]
+
+    def _find_near_duplicate(self, query, intent, crop, expired_before):
+        candidates = self._db.execute(
+            "SELECT key, answer, created, query FROM answers "
+            "WHERE intent = ? AND crop = ? AND created >= ? ORDER BY accessed DESC LIMIT ?",
+            (intent, crop, expired_before, NEAR_DUPLICATE_CANDIDATES)).fetchall()
+        best, best_score = None, self.near_duplicate_threshold
+        for key, answer, created, candidate in candidates:
+            score = similarity(query, candidate)
+            if score >= best_score:
+                best, best_score = (key, answer, created), score
+        return best
+
+    def put(self, message, answer, intent="general", crop=None):
+        query = normalize_query(message)
+        crop = crop or ""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, intent, crop, query, answer, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.make_key(query, intent, crop), intent, crop, query, answer, now, now))
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        expired = self._db.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_seconds,)).rowcount
+        count = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY accessed ASC LIMIT ?)", (overflow,))
+        self.evictions += expired + max(overflow, 0)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "near_duplicate_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide answer cache, or None when disabled"""
+    global _cache
+    if not settings.CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = ResponseCache()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Could not open answer cache ({e}).")
+                    return None
+    return _cache
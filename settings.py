@@ -0,0 +1,112 @@
+"""Deployment settings, read once from AGRIBOT_* environment variables"""
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def env_str(name, default):
+    return os.environ.get(name, default)
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Answer cache
+CACHE_ENABLED = env_bool("AGRIBOT_CACHE", True)
+CACHE_PATH = env_str("AGRIBOT_CACHE_PATH", os.path.join(BASE_DIR, "cache", "answers.sqlite3"))
+CACHE_MAX_ENTRIES = env_int("AGRIBOT_CACHE_MAX_ENTRIES", 5000)
+CACHE_TTL_SECONDS = env_int("AGRIBOT_CACHE_TTL", 7 * 24 * 3600)
+CACHE_NEAR_DUPLICATES = env_bool("AGRIBOT_CACHE_NEAR_DUPLICATES", True)
+CACHE_NEAR_DUPLICATE_THRESHOLD = env_float("AGRIBOT_CACHE_NEAR_DUPLICATE_THRESHOLD", 0.85)
+
+# Greedy decoding makes a cached answer identical to a fresh one
+DETERMINISTIC_GENERATION = env_bool("AGRIBOT_DETERMINISTIC", False)
+
+# Inference worker: requests arriving within the wait window share one batch
+BATCH_MAX_SIZE = env_int("AGRIBOT_BATCH_SIZE", 4)
+BATCH_WAIT_MS = env_int("AGRIBOT_BATCH_WAIT_MS", 25)
+
+# Hard upper bound on one AI answer; past it the knowledge-base fallback is used
+GENERATION_TIMEOUT_SECONDS = env_float("AGRIBOT_GENERATION_TIMEOUT", 45.0)
+
+# AI answer length: per-request budgets stay within [MIN, MAX] tokens, and the
+# ceiling halves for every SHED_QUEUE_DEPTH requests waiting (0 disables shedding)
+GENERATION_MIN_TOKENS = env_int("AGRIBOT_MIN_NEW_TOKENS", 48)
+GENERATION_MAX_TOKENS = env_int("AGRIBOT_MAX_NEW_TOKENS", 256)
+GENERATION_SHED_QUEUE_DEPTH = env_int("AGRIBOT_SHED_QUEUE_DEPTH", 4)
+
+# Knowledge base file, re-checked for changes at most this often (0 loads it once)
+KNOWLEDGE_BASE_PATH = env_str("AGRIBOT_KB_PATH", os.path.join(BASE_DIR, "data", "knowledge_base.json"))
+KNOWLEDGE_BASE_RELOAD_SECONDS = env_float("AGRIBOT_KB_RELOAD_SECONDS", 2.0)
+
+# Deployment mode: "full" falls back to the AI model, "kb_only" never loads it
+MODE = env_str("AGRIBOT_MODE", "full")
+if MODE not in ("full", "kb_only"):
+    raise ValueError(f"AGRIBOT_MODE must be full or kb_only, not {MODE!r}")
+KB_ONLY = MODE == "kb_only"
+
+# Inference profile: auto, fp32, bf16 or int8 (dynamic int8 linear layers on CPU)
+MODEL_PROFILE = env_str("AGRIBOT_PROFILE", "auto")
+# Prepared model snapshots (python model_snapshot.py prepare). OFFLINE never
+# downloads: loading fails with a clear error when the snapshot is missing.
+MODEL_DIR = env_str("AGRIBOT_MODEL_DIR", os.path.join(BASE_DIR, "models"))
+OFFLINE = env_bool("AGRIBOT_OFFLINE", False)
+# torch intra-op threads; 0 keeps torch's default
+TORCH_THREADS = env_int("AGRIBOT_THREADS", 0)
+
+# Assisted decoding: a small draft model proposes DRAFT_TOKENS tokens that the
+# main model verifies in one pass. "auto" follows the profile table in
+# model_registry, "on"/"off" override it; no draft model means off.
+DRAFT_MODEL_ID = env_str("AGRIBOT_DRAFT_MODEL", "")
+ASSISTED_DECODING = env_str("AGRIBOT_ASSISTED", "auto")
+if ASSISTED_DECODING not in ("auto", "on", "off"):
+    raise ValueError(f"AGRIBOT_ASSISTED must be auto, on or off, not {ASSISTED_DECODING!r}")
+DRAFT_TOKENS = env_int("AGRIBOT_DRAFT_TOKENS", 5)
+
+# PDF text extraction processes for the document indexes (0 = one per CPU)
+INGEST_WORKERS = env_int("AGRIBOT_INGEST_WORKERS", 0)
+
+# Sentence-model vector score at which a PDF passage answers a general question
+# directly; unset keeps direct answers off. Set it to the threshold
+# benchmarks/calibrate_vectors.py measures on the deployed model and PDFs.
+DOCUMENT_ANSWER_THRESHOLD = env_float("AGRIBOT_DOCUMENT_ANSWER_THRESHOLD", None)
+
+# Precompute the KV cache of each prompt template's fixed prefix after loading
+PREFIX_CACHE_ENABLED = env_bool("AGRIBOT_PREFIX_CACHE", True)
+
+# Conversation memory packed into AI prompts
+HISTORY_TOKEN_BUDGET = env_int("AGRIBOT_HISTORY_TOKENS", 768)
+HISTORY_MAX_TURNS = env_int("AGRIBOT_HISTORY_MAX_TURNS", 20)
+
+# Streamlit chat transcript: messages per page, kept uncompressed per session,
+# and the byte budget of the shared archive of older (compressed) messages
+CHAT_PAGE_SIZE = env_int("AGRIBOT_CHAT_PAGE_SIZE", 20)
+CHAT_LIVE_MESSAGES = env_int("AGRIBOT_CHAT_LIVE_MESSAGES", 60)
+CHAT_ARCHIVE_MAX_BYTES = env_int("AGRIBOT_CHAT_ARCHIVE_BYTES", 64 * 1024 * 1024)
+
+# HTTP API
+API_HOST = env_str("AGRIBOT_API_HOST", "127.0.0.1")
+API_PORT = env_int("AGRIBOT_API_PORT", 8000)
+API_MAX_BATCH = env_int("AGRIBOT_API_MAX_BATCH", 100)
+API_MAX_SESSIONS = env_int("AGRIBOT_API_MAX_SESSIONS", 1000)
+
+# Telemetry: JSONL file receiving every request trace (empty disables)
+TRACE_LOG = env_str("AGRIBOT_TRACE_LOG", "")
+# Fraction of requests run under a profiler (cprofile or torch), written to PROFILER_DIR
+PROFILER_SAMPLE_RATE = env_float("AGRIBOT_PROFILER_SAMPLE_RATE", 0.0)
+PROFILER = env_str("AGRIBOT_PROFILER", "cprofile")
+PROFILER_DIR = env_str("AGRIBOT_PROFILER_DIR", os.path.join(BASE_DIR, "profiles"))
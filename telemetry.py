@@ -0,0 +1,339 @@
+"""Per-request tracing spans, process-wide metrics and sampled profiling.
+
+Every process_message call runs inside a trace. Stages wrap themselves in
+``span(name)``; each span's duration lands in the trace (returned to API
+callers and optionally appended to a JSONL log) and in the
+``agribot_span_seconds`` histogram. Counters and gauges are rendered in the
+Prometheus text format by ``render_metrics()``, which the HTTP API serves at
+GET /metrics.
+
+With AGRIBOT_PROFILER_SAMPLE_RATE above zero, that fraction of requests is
+run under cProfile (or the torch profiler) and the result written to
+AGRIBOT_PROFILER_DIR.
+"""
+import bisect
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import settings
+
+# Histogram buckets in seconds, from a regex match to a long CPU generation
+SPAN_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Traces kept in memory for inspection
+RECENT_TRACES = 100
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    """A counter or gauge, optionally labelled, or computed on scrape by callback.
+
+    A callback returns either a number or a dict mapping label-value tuples to
+    numbers.
+    """
+
+    def __init__(self, name, help, kind="counter", labels=(), callback=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = tuple(labels)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    def _key(self, labels):
+        return tuple(map(labels.__getitem__, self.labels))
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        if self.callback is None:
+            with self._lock:
+                values = dict(self._values)
+        else:
+            try:
+                values = self.callback()
+            except Exception:
+                return []
+            if not isinstance(values, dict):
+                values = {(): values}
+        return [(self.name, tuple(zip(self.labels, key)), value) for key, value in sorted(values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Histogram(Metric):
+    def __init__(self, name, help, labels=(), buckets=SPAN_BUCKETS):
+        super().__init__(name, help, kind="histogram", labels=labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (plus +Inf), then the sum; made cumulative on scrape
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[bisect.bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                labels = tuple(zip(self.labels, key))
+                count = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), state):
+                    count += bucket_count
+                    samples.append((f"{self.name}_bucket", labels + (("le", bound),), count))
+                samples.append((f"{self.name}_sum", labels, round(state[-1], 6)))
+                samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+METRICS = []
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUESTS = Metric("agribot_requests_total", "Messages answered, by detected intent", labels=("intent",))
+RESPONSES = Metric("agribot_responses_total",
+                   "Answers by source: knowledge_base, documents or ai", labels=("source",))
+AI_FALLBACKS = Metric("agribot_ai_fallbacks_total",
+                      "AI answers replaced by a knowledge-base fallback, by reason", labels=("reason",))
+TERM_CORRECTIONS = Metric("agribot_term_corrections_total",
+                          "Misspelled words resolved to a knowledge-base term by the fuzzy index")
+GENERATION_STOPS = Metric("agribot_generation_stops_total",
+                          "AI replies by why generation ended (eos, marker, repetition, budget)",
+                          labels=("reason",))
+TOKENS_GENERATED = Metric("agribot_tokens_generated_total", "Tokens produced by the language model")
+SPAN_SECONDS = Histogram("agribot_span_seconds", "Time spent in each request stage", labels=("span",))
+REQUEST_SECONDS = Histogram("agribot_request_seconds", "End-to-end message latency by answer source",
+                            labels=("source",))
+
+
+def _model_state():
+    from model_registry import FAILED, IDLE, LOADING, READY, UNAVAILABLE, get_registry
+    state = get_registry().state
+    return {(name,): int(name == state) for name in (IDLE, LOADING, READY, FAILED, UNAVAILABLE)}
+
+
+def _model_load_seconds():
+    from model_registry import get_registry
+    return get_registry().load_seconds or 0.0
+
+
+def _queue_depth():
+    import inference_worker
+    worker = inference_worker._worker
+    return worker.metrics()["queue_depth"] if worker is not None else 0
+
+
+Metric("agribot_model_state", "1 for the current model load state", kind="gauge", labels=("state",),
+       callback=_model_state)
+Metric("agribot_model_load_seconds", "Duration of the last model load", kind="gauge",
+       callback=_model_load_seconds)
+Metric("agribot_inference_queue_depth", "Generation requests waiting for the worker", kind="gauge",
+       callback=_queue_depth)
+
+
+class Trace:
+    """Timing spans and attributes of one request"""
+    __slots__ = ("request_id", "started", "finished", "spans", "attributes")
+
+    _ids = itertools.count(1)
+
+    def __init__(self, **attributes):
+        self.request_id = f"{os.getpid()}-{next(self._ids)}"
+        self.started = time.perf_counter()
+        self.finished = None
+        self.spans = []
+        self.attributes = attributes
+
+    def add(self, name, seconds, started=None):
+        offset = (started if started is not None else time.perf_counter() - seconds) - self.started
+        self.spans.append((name, max(0.0, offset), seconds))
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self):
+        """Milliseconds per span name; repeated spans are summed"""
+        totals = {}
+        for name, _, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds * 1000
+        return {name: round(ms, 3) for name, ms in totals.items()}
+
+    def to_dict(self):
+        return {
+            "request_id": self.request_id,
+            "total_ms": round(self.elapsed * 1000, 3),
+            "spans": [{"name": name, "start_ms": round(offset * 1000, 3), "ms": round(seconds * 1000, 3)}
+                      for name, offset, seconds in self.spans],
+            **self.attributes,
+        }
+
+
+_current = contextvars.ContextVar("agribot_trace", default=None)
+_log_lock = threading.Lock()
+recent_traces = deque(maxlen=RECENT_TRACES)
+
+
+def current_trace():
+    return _current.get()
+
+
+def record(name, seconds):
+    """Add an already measured stage, e.g. one timed on the inference worker"""
+    SPAN_SECONDS.observe(seconds, span=name)
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+class span:
+    """Context manager timing one stage of the current request"""
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        SPAN_SECONDS.observe(seconds, span=self.name)
+        trace = _current.get()
+        if trace is not None:
+            trace.add(self.name, seconds, self.started)
+
+
+class trace_request:
+    """Collect the spans of one request: ``with trace_request() as trace:``"""
+    __slots__ = ("trace", "_token", "_profiler")
+
+    def __init__(self, **attributes):
+        self.trace = Trace(**attributes)
+
+    def __enter__(self):
+        self._token = _current.set(self.trace)
+        self._profiler = _sampled_profiler(self.trace)
+        if self._profiler is not None:
+            self._profiler.__enter__()
+        return self.trace
+
+    def __exit__(self, *exc):
+        if self._profiler is not None:
+            self._profiler.__exit__(*exc)
+        _current.reset(self._token)
+        trace = self.trace
+        trace.finished = time.perf_counter()
+        REQUEST_SECONDS.observe(trace.elapsed, source=trace.attributes.get("source", "unknown"))
+        recent_traces.append(trace)
+        if settings.TRACE_LOG:
+            _write_trace(trace)
+
+
+def _write_trace(trace):
+    try:
+        with _log_lock, open(settings.TRACE_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(trace.to_dict(), ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"⚠️ Could not write trace log ({e}).")
+
+
+# Only one sampled profile runs at a time; Python allows a single active profiler
+_profile_lock = threading.Lock()
+
+
+def _sampled_profiler(trace):
+    """A profiler context for this request if it is sampled, else None"""
+    rate = settings.PROFILER_SAMPLE_RATE
+    if rate <= 0 or random.random() >= rate or not _profile_lock.acquire(blocking=False):
+        return None
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{trace.request_id}"
+    if settings.PROFILER == "torch":
+        path = os.path.join(settings.PROFILER_DIR, name + ".trace.json")
+        profiler = _torch_profile(path)
+    else:
+        path = os.path.join(settings.PROFILER_DIR, name + ".prof")
+        profiler = _cprofile(path)
+    trace.attributes["profile"] = path
+    return _releasing(profiler)
+
+
+@contextlib.contextmanager
+def _releasing(profiler):
+    try:
+        os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+        with profiler:
+            yield
+    finally:
+        _profile_lock.release()
+
+
+@contextlib.contextmanager
+def _cprofile(path):
+    """Profiles the request thread; generation on the worker shows up as waiting"""
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+@contextlib.contextmanager
+def _torch_profile(path):
+    """Records torch operators from every thread, including the inference worker"""
+    try:
+        from torch.profiler import ProfilerActivity, profile
+    except ImportError:
+        yield
+        return
+    with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as profiler:
+        yield
+    profiler.export_chrome_trace(path)
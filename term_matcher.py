@@ -0,0 +1,254 @@
+"""Single-pass keyword matcher for intents and knowledge-base terms.
+
+Every intent keyword, crop, pest, disease and weather term is compiled into
+one word-boundary regex whose alternation is laid out as a trie, so a message
+is lowercased and scanned once no matter how many terms there are, and "use"
+no longer fires inside "because" or "ph" inside "phone".
+
+Words that match nothing exactly are looked up in a symmetric-delete index of
+the knowledge-base terms, so misspellings like "tomatoe" or "termits" still
+resolve. Only longer words are corrected, to keep "store" from becoming
+"storm" and "chilli" from becoming "chilly".
+"""
+import re
+from functools import lru_cache
+
+# Keyword buckets in the priority order identify_intent has always used
+INTENT_KEYWORDS = {
+    "crop_info": ["crop", "plant", "grow", "cultivation"],
+    "pest_management": ["pest", "insect", "bug", "damage"],
+    "disease_management": ["disease", "fungus", "infection", "sick"],
+    "weather_advice": ["weather", "rain", "drought", "temperature"],
+    "fertilizer_advice": ["fertilizer", "fertiliser", "nutrient", "feeding", "npk"],
+    "farming_tips": ["tip", "advice", "suggestion", "help"],
+    "soil_management": ["soil", "ph", "organic", "compost"],
+    "usage_info": ["use", "usage", "how to", "prepare", "cook"],
+}
+
+# Inflections accepted after a term ("pests", "growing", "rainy", "used")
+SUFFIXES = ("s", "es", "d", "ed", "ing", "y")
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Corrections remembered per matcher; farmers' vocabulary repeats a lot
+FUZZY_CACHE_SIZE = 4096
+
+# Typo correction: shortest word corrected, shortest term it may become, and
+# the word length from which two edits are allowed instead of one
+FUZZY_MIN_WORD = 6
+FUZZY_MIN_TERM = 5
+FUZZY_TWO_EDITS_FROM = 9
+
+
+def max_edits(word):
+    if len(word) < FUZZY_MIN_WORD:
+        return 0
+    return 2 if len(word) >= FUZZY_TWO_EDITS_FROM else 1
+
+
+def _deletes(word, distance):
+    """word with every combination of up to distance characters removed"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein (optimal string alignment) distance, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    """Symmetric-delete index: a word and a term within k edits share a k-deletion variant"""
+
+    def __init__(self, terms, max_distance=2):
+        self.max_distance = max_distance
+        self.variants = {}
+        for term in terms:
+            for variant in _deletes(term, max_distance):
+                self.variants.setdefault(variant, set()).add(term)
+
+    def lookup(self, word, distance):
+        """The terms closest to word within distance edits, sorted; empty when none are"""
+        candidates = set()
+        for variant in _deletes(word, distance):
+            candidates |= self.variants.get(variant, set())
+        best, best_distance = [], distance + 1
+        for term in candidates:
+            found = edit_distance(word, term, distance)
+            if found < best_distance:
+                best, best_distance = [term], found
+            elif found == best_distance:
+                best.append(term)
+        return sorted(best)
+
+
+def _trie_pattern(terms):
+    """Regex alternation for terms, factored into a trie so it scales"""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def render(node):
+        end = "" in node
+        branches = [re.escape(char) + render(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not end:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if end else body
+
+    return render(trie)
+
+
+class Matches:
+    """Everything one scan found, grouped by category"""
+    __slots__ = ("found", "intents", "corrections")
+
+    def __init__(self, found, intents, corrections=()):
+        self.found = found
+        self.intents = intents
+        # (word as typed, term it was corrected to)
+        self.corrections = corrections
+
+    @property
+    def intent(self):
+        return self.intents[0] if self.intents else "general"
+
+    def all(self, category):
+        return self.found.get(category, [])
+
+    def first(self, category):
+        labels = self.found.get(category)
+        return labels[0] if labels else None
+
+    def __repr__(self):
+        return f"Matches(intents={self.intents!r}, found={self.found!r})"
+
+
+class TermMatcher:
+    """Compiled matcher over (category, terms) tables.
+
+    Synonyms are (category, synonym, canonical) triples; a synonym matches
+    like a term but is reported as its canonical term.
+    """
+
+    def __init__(self, tables, synonyms=()):
+        # term -> [(category, rank)]; rank keeps each table's own order
+        self.lookup = {}
+        self.terms = {category: list(terms) for category, terms in tables}
+        for category, terms in tables:
+            for rank, term in enumerate(terms):
+                self.lookup.setdefault(term.lower(), []).append((category, rank))
+        for category, synonym, canonical in synonyms:
+            hit = (category, self.terms[category].index(canonical))
+            hits = self.lookup.setdefault(synonym.lower(), [])
+            if hit not in hits:
+                hits.append(hit)
+        self.intent_order = {intent: rank for rank, intent in enumerate(INTENT_KEYWORDS)}
+        suffixes = "|".join(sorted(SUFFIXES, key=len, reverse=True))
+        self.pattern = re.compile(
+            r"(?<![a-z0-9])(?:" + _trie_pattern(self.lookup) + r")(?:" + suffixes + r")?(?![a-z0-9])"
+        )
+        # Knowledge-base terms (and synonyms) only; intent keywords are too short and common
+        self.fuzzy = FuzzyIndex(
+            term for term, hits in self.lookup.items()
+            if " " not in term and len(term) >= FUZZY_MIN_TERM
+            and any(category not in self.intent_order for category, _ in hits)
+        )
+        self._fuzzy_cache = {}
+
+    def _hits(self, word):
+        hits = self.lookup.get(word)
+        if hits:
+            yield from hits
+        for suffix in SUFFIXES:
+            if word.endswith(suffix):
+                stem_hits = self.lookup.get(word[:-len(suffix)])
+                if stem_hits:
+                    yield from stem_hits
+
+    def scan(self, message):
+        """Find every intent and knowledge-base term in one pass over message"""
+        ranked = {}
+        message = message.lower()
+        end = 0
+        corrections = []
+        for match in self.pattern.finditer(message):
+            corrections += self._correct(message, end, match.start(), ranked)
+            end = match.end()
+            for category, rank in self._hits(match.group(0)):
+                ranked.setdefault(category, set()).add(rank)
+        corrections += self._correct(message, end, len(message), ranked)
+
+        intents = [intent for intent in INTENT_KEYWORDS if intent in ranked]
+        found = {}
+        for category, ranks in ranked.items():
+            if category in self.intent_order:
+                continue
+            found[category] = [self.terms[category][rank] for rank in sorted(ranks)]
+        return Matches(found, intents, corrections)
+
+    def _correct(self, message, start, end, ranked):
+        """Fuzzy-match the words in message[start:end] that no exact term covered"""
+        corrections = []
+        for word in WORD_RE.findall(message, start, end):
+            if len(word) < FUZZY_MIN_WORD:
+                continue
+            term = self._fuzzy_cache.get(word, False)
+            if term is False:
+                term = self._closest_term(word)
+                if len(self._fuzzy_cache) >= FUZZY_CACHE_SIZE:
+                    self._fuzzy_cache.clear()
+                self._fuzzy_cache[word] = term
+            if term is None:
+                continue
+            corrections.append((word, term))
+            for category, rank in self.lookup[term]:
+                ranked.setdefault(category, set()).add(rank)
+        return corrections
+
+    def _closest_term(self, word):
+        """Unambiguous correction for word: closest terms that all mean the same thing"""
+        terms = self.fuzzy.lookup(word, max_edits(word))
+        if not terms or any(self.lookup[term] != self.lookup[terms[0]] for term in terms[1:]):
+            return None
+        return terms[0]
+
+
+@lru_cache(maxsize=8)
+def _build(tables, synonyms):
+    return TermMatcher(tables, synonyms)
+
+
+def build_matcher(crops=(), pests=(), diseases=(), weather=(), synonyms=()):
+    """Return the shared matcher for these knowledge tables, compiling it once"""
+    tables = tuple((intent, tuple(words)) for intent, words in INTENT_KEYWORDS.items())
+    tables += (
+        ("crop", tuple(crops)),
+        ("pest", tuple(pests)),
+        ("disease", tuple(diseases)),
+        ("weather", tuple(weather)),
+    )
+    return _build(tables, tuple(synonyms))
@@ -0,0 +1,24 @@
+import pytest
+
+from api import AgriBotService, ApiError
+
+
+@pytest.fixture(scope="module")
+def service():
+    return AgriBotService()
+
+
+@pytest.mark.parametrize("session_id", [["a"], {"id": "a"}, 7, "", "  "])
+def test_invalid_session_id_is_a_client_error(service, session_id):
+    with pytest.raises(ApiError) as error:
+        service.ask({"question": "Tell me about wheat", "session_id": session_id})
+    assert error.value.status == 400
+    with pytest.raises(ApiError) as error:
+        service.batch({"questions": ["Tell me about wheat"], "session_id": session_id})
+    assert error.value.status == 400
+
+
+def test_session_id_keeps_the_conversation(service):
+    service.ask({"question": "Tell me about wheat", "session_id": "farm-1"})
+    assert "Wheat" in service.ask({"question": "and its fertilizer?", "session_id": "farm-1"})["answer"]
+    assert service.ask({"question": "Tell me about rice"})["source"] == "knowledge_base"
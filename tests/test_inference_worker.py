@@ -0,0 +1,58 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from generation_budget import StopTracker  # noqa: E402
+from inference_worker import InferenceRequest, _reply_criteria  # noqa: E402
+
+PROMPT_LENGTH = 3
+END = 9
+WORDS = {END: "<|end|>"}
+
+
+def decode(tokens):
+    return " ".join(WORDS.get(token, f"w{token}") for token in tokens)
+
+
+class RecordingStreamer:
+    def __init__(self):
+        self.tokens = []
+
+    def put(self, value):
+        self.tokens.extend(value.tolist())
+
+    def end(self):
+        pass
+
+
+def setup(budgets):
+    requests = [InferenceRequest("prompt", budget, {}, streamer=RecordingStreamer()) for budget in budgets]
+    trackers = [StopTracker(decode, budget) for budget in budgets]
+    return requests, trackers, _reply_criteria(requests, trackers, PROMPT_LENGTH)
+
+
+def step(criteria, rows):
+    """Call the criterion the way generate() does without output_scores: scores=None"""
+    return criteria(torch.tensor(rows), None).tolist()
+
+
+def test_streams_and_stops_with_scores_none():
+    requests, trackers, criteria = setup([10, 2])
+    prompt = [1, 1, 1]
+    assert step(criteria, [prompt + [4], prompt + [5]]) == [False, False]
+    # Two accepted tokens at once, as after assisted verification
+    assert step(criteria, [prompt + [4, 6, END], prompt + [5, 7, 8]]) == [True, True]
+
+    assert requests[0].streamer.tokens == [4, 6, END]
+    assert trackers[0].reason == "marker"
+    # The budget ends the second row after its second token
+    assert requests[1].streamer.tokens == [5, 7]
+    assert trackers[1].reason == "budget"
+
+
+def test_cancelled_row_stops():
+    requests, trackers, criteria = setup([10, 10])
+    requests[1].cancel_event.set()
+    assert step(criteria, [[1, 1, 1, 4], [1, 1, 1, 5]]) == [False, True]
+    assert requests[1].streamer.tokens == [5]
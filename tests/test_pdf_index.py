@@ -0,0 +1,45 @@
+import os
+
+from pdf_index import CURRENT, BM25Index, build_index, current_dir
+
+
+def chunks(word, count):
+    return [("doc.pdf", page, f"{word} leaves on page {page} " * (page + 1)) for page in range(count)]
+
+
+def test_rebuild_leaves_open_index_intact(tmp_path):
+    old = build_index(chunks("yellow", 5), str(tmp_path))
+    new = build_index(chunks("curled", 50), str(tmp_path))
+
+    # The open index still reads its own files, whatever the rebuild wrote
+    assert old.size == 5
+    assert [hit[3].split()[0] for hit in old.search("yellow leaves")] == ["yellow"] * 3
+    assert new.size == 50
+    assert new.search("yellow") == []
+    assert BM25Index(str(tmp_path)).size == 50
+    old.close()
+    new.close()
+
+
+def test_only_current_and_previous_builds_are_kept(tmp_path):
+    for word in ("one", "two", "three"):
+        build_index(chunks(word, 2), str(tmp_path)).close()
+    builds = sorted(name for name in os.listdir(tmp_path) if name != CURRENT)
+    assert len(builds) == 2
+    assert os.path.basename(current_dir(str(tmp_path))) in builds
+
+
+def test_failed_build_keeps_live_index(tmp_path):
+    build_index(chunks("yellow", 3), str(tmp_path)).close()
+    live = current_dir(str(tmp_path))
+
+    def broken():
+        yield ("doc.pdf", 1, "partial text")
+        raise OSError("disk full")
+
+    try:
+        build_index(broken(), str(tmp_path))
+    except OSError:
+        pass
+    assert current_dir(str(tmp_path)) == live
+    assert BM25Index(str(tmp_path)).size == 3
@@ -0,0 +1,31 @@
+from prompts import split_prompt_ids
+
+VOCAB = ["<s>", "ab", "a", "b", "c", "x", "\n"]
+
+
+def tokenize(text):
+    """Greedy longest-match tokenizer, enough to merge tokens across a boundary"""
+    ids = [0]
+    while text:
+        piece = max((p for p in VOCAB[1:] if text.startswith(p)), key=len)
+        ids.append(VOCAB.index(piece))
+        text = text[len(piece):]
+    return ids
+
+
+def test_suffix_ids_are_cut_from_the_full_prompt():
+    prefix = tokenize("xa\n")
+    rows = [tokenize("xa\nbc"), tokenize("xa\nc")]
+    assert split_prompt_ids(prefix, rows) == [row[len(prefix):] for row in rows]
+
+
+def test_prefix_merging_into_the_body_falls_back_to_the_full_prompt():
+    prefix = tokenize("xa")
+    # "xa" + "bc" tokenizes as x|ab|c, so the cached x|a would not be a prefix of it
+    assert tokenize("xabc")[:len(prefix)] != prefix
+    assert split_prompt_ids(prefix, [tokenize("xa\nc"), tokenize("xabc")]) is None
+
+
+def test_prompt_with_no_body_tokens_is_not_split():
+    prefix = tokenize("xa\n")
+    assert split_prompt_ids(prefix, [tokenize("xa\n")]) is None
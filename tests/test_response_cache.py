@@ -0,0 +1,34 @@
+import pytest
+
+from response_cache import ResponseCache
+
+CACHED = "When should I sow wheat in Punjab?"
+
+
+@pytest.fixture
+def cache():
+    cache = ResponseCache(":memory:", near_duplicates=True, near_duplicate_threshold=0.85)
+    cache.put(CACHED, "Sow wheat from late October to mid November.", "general", "wheat")
+    return cache
+
+
+@pytest.mark.parametrize("question", [
+    "How should I sow wheat in Punjab?",
+    "Where should I sow wheat in Punjab?",
+    "Why should I sow wheat in Punjab?",
+    "Which wheat should I sow in Punjab?",
+    "What should I sow after wheat in Punjab?",
+    "When should I not sow wheat in Punjab?",
+    "When shouldn't I sow wheat in Punjab?",
+])
+def test_different_questions_do_not_collide(cache, question):
+    assert cache.get(question, "general", "wheat") is None
+    assert cache.near_hits == 0
+
+
+@pytest.mark.parametrize("question", [
+    "when should i sow wheat in punjab",
+    "When should I sow the wheat in Punjab??",
+])
+def test_rephrasings_still_hit(cache, question):
+    assert cache.get(question, "general", "wheat") is not None
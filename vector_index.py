@@ -0,0 +1,294 @@
+"""Quantized dense-vector passage search over the PDFs in data/.
+
+Passage embeddings are stored as one int8 (or float16) matrix in a ``.npy``
+file that is memory-mapped on load, so a query is a single matrix-vector
+product followed by a top-k partition. A manifest records the content hash
+and row range of every PDF; rebuilding only re-embeds files whose hash
+changed and copies the other rows across.
+
+    python vector_index.py build
+    python vector_index.py search "leaves turning yellow and curling"
+"""
+import importlib.util
+import json
+import os
+import threading
+import zlib
+
+import settings
+
+# numpy takes longer to import than the rest of the engine, so it is imported on first use
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+from pdf_index import BASE_DIR, DATA_DIR, tokenize
+
+INDEX_DIR = os.path.join(BASE_DIR, "index", "vectors")
+
+FORMAT_VERSION = 1
+SENTENCE_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class HashingEmbedder:
+    """Dependency-free embedder hashing words and character trigrams.
+
+    Trigrams let "yellowing" and "yellow" or "curling" and "curl" share most
+    of their features, which is enough to rank passages for ``search``. Its
+    scores cannot tell a paraphrase from an unrelated question, though: on
+    benchmarks/calibrate_vectors.py unrelated questions reach 0.33 and wrong
+    passages 0.42, above several correct matches, so it never answers on its own.
+    """
+    match_threshold = None
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.name = f"hashing-v1-{dim}"
+
+    def _features(self, text):
+        for token in tokenize(text):
+            yield "w:" + token, 1.0
+            padded = f"<{token}>"
+            for i in range(len(padded) - 2):
+                yield "c:" + padded[i:i + 3], 0.5
+
+    def embed(self, texts):
+        import numpy as np
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                matrix[row, digest % self.dim] += sign * weight
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class SentenceEmbedder:
+    """Embedder backed by a small sentence-transformers model.
+
+    Its scores depend on the model and the PDFs, so it answers on its own only
+    above a threshold measured for them (AGRIBOT_DOCUMENT_ANSWER_THRESHOLD).
+    """
+    match_threshold = settings.DOCUMENT_ANSWER_THRESHOLD
+
+    def __init__(self, model_id=SENTENCE_MODEL_ID):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_id)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st:{model_id}"
+
+    def embed(self, texts):
+        import numpy as np
+
+        return self.model.encode(list(texts), normalize_embeddings=True,
+                                 convert_to_numpy=True).astype(np.float32)
+
+
+def default_embedder():
+    """Use sentence-transformers when installed, hashing features otherwise"""
+    try:
+        return SentenceEmbedder()
+    except Exception:
+        return HashingEmbedder()
+
+
+def embedder_from_name(name):
+    """Recreate the embedder recorded in an index manifest"""
+    if name.startswith("hashing-v1-"):
+        return HashingEmbedder(int(name.rsplit("-", 1)[1]))
+    if name.startswith("st:"):
+        return SentenceEmbedder(name[3:])
+    raise ValueError(f"Unknown embedder {name!r}")
+
+
+def quantize(matrix, dtype):
+    """Convert unit-length float32 rows to the storage dtype"""
+    import numpy as np
+
+    if dtype == "int8":
+        return np.clip(np.rint(matrix * 127.0), -127, 127).astype(np.int8)
+    return matrix.astype(np.float16)
+
+
+class VectorIndex:
+    """Memory-mapped passage embeddings with their manifest"""
+
+    def __init__(self, index_dir=INDEX_DIR, embedder=None):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Incompatible vector index in {index_dir}; rebuild it with 'python vector_index.py build'")
+
+        self.embedder = embedder or embedder_from_name(self.manifest["embedder"])
+        if self.embedder.name != self.manifest["embedder"]:
+            raise ValueError(f"Vector index was built with {self.manifest['embedder']}, "
+                             f"not {self.embedder.name}; rebuild it")
+
+        self.dtype = self.manifest["dtype"]
+        self.passages = self.manifest["passages"]
+        self.scale = 1.0 / 127.0 if self.dtype == "int8" else 1.0
+        import numpy as np
+
+        if self.passages:
+            self.matrix = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        else:
+            self.matrix = np.zeros((0, self.embedder.dim), dtype=self.dtype)
+
+    @property
+    def match_threshold(self):
+        return self.embedder.match_threshold
+
+    def search(self, query, top_k=3):
+        """Return up to top_k (score, document, page, text) tuples for query"""
+        import numpy as np
+
+        if not len(self.passages):
+            return []
+        vector = self.embedder.embed([query])[0]
+        scores = (self.matrix @ vector.astype(np.float32)) * self.scale
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(float(scores[row]), *self.passages[row]) for row in best]
+
+
+def update_index(data_dir=DATA_DIR, index_dir=INDEX_DIR, embedder=None, dtype="int8"):
+    """Bring the vector index in line with data_dir, re-embedding only changed PDFs"""
+    import numpy as np
+
+    from pdf_ingest import ingest, iter_document
+
+    if dtype not in ("int8", "float16"):
+        raise ValueError("dtype must be 'int8' or 'float16'")
+    embedder = embedder or default_embedder()
+    os.makedirs(index_dir, exist_ok=True)
+
+    previous = None
+    try:
+        previous = VectorIndex(index_dir, embedder)
+        if previous.dtype != dtype:
+            previous = None
+    except (OSError, ValueError, KeyError):
+        previous = None
+
+    files = {}
+    passages = []
+    blocks = []
+    reused, embedded = [], []
+    manifest, _ = ingest(data_dir)
+    for name, entry in manifest["files"].items():
+        sha = entry["sha256"]
+        old = previous.manifest["files"].get(name) if previous else None
+        start = len(passages)
+        if old and old["sha256"] == sha:
+            old_start, old_end = old["rows"]
+            passages.extend(previous.passages[old_start:old_end])
+            blocks.append(np.asarray(previous.matrix[old_start:old_end]))
+            reused.append(name)
+        else:
+            chunks = [[name, page, text] for page, text in iter_document(name)]
+            passages.extend(chunks)
+            if chunks:
+                blocks.append(quantize(embedder.embed([text for _, _, text in chunks]), dtype))
+            embedded.append(name)
+        files[name] = {"sha256": sha, "rows": [start, len(passages)]}
+
+    matrix_path = os.path.join(index_dir, "embeddings.npy")
+    if passages:
+        tmp_path = matrix_path + ".tmp"
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype,
+                                        shape=(len(passages), embedder.dim))
+        row = 0
+        for block in blocks:
+            out[row:row + len(block)] = block
+            row += len(block)
+        out.flush()
+        del out
+        previous = None  # release the old mapping before replacing the file
+        os.replace(tmp_path, matrix_path)
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "embedder": embedder.name,
+        "dtype": dtype,
+        "files": files,
+        "passages": passages,
+    }
+    tmp_manifest = os.path.join(index_dir, "manifest.json.tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp_manifest, os.path.join(index_dir, "manifest.json"))
+    return VectorIndex(index_dir, embedder), reused, embedded
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+_preload_started = False
+
+
+def get_vector_index():
+    """Return the process-wide vector index, or None when unavailable.
+
+    kb_only mode never loads it, so the sentence model and torch stay out of
+    that process.
+    """
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                _index = None
+                if NUMPY_AVAILABLE and not settings.KB_ONLY:
+                    try:
+                        _index = VectorIndex(INDEX_DIR)
+                    except FileNotFoundError:
+                        pass
+                    except Exception as e:
+                        print(f"⚠️ Could not load vector index ({e}).")
+                _index_loaded = True
+    return _index
+
+
+def preload_vector_index():
+    """Load the vector index in a background thread, so no question waits for the sentence model"""
+    global _preload_started
+    if not _preload_started and not _index_loaded:
+        _preload_started = True
+        threading.Thread(target=get_vector_index, name="agribot-vectors", daemon=True).start()
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build or query the AgriBot vector index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="embed new or changed PDFs in data/")
+    build.add_argument("--dtype", choices=["int8", "float16"], default="int8")
+    build.add_argument("--hashing", action="store_true", help="use the hashing embedder")
+    search = sub.add_parser("search", help="run a semantic query")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        embedder = HashingEmbedder() if args.hashing else default_embedder()
+        started = time.perf_counter()
+        index, reused, embedded = update_index(embedder=embedder, dtype=args.dtype)
+        print(f"{len(index.passages)} passages ({args.dtype}, {embedder.name}) in "
+              f"{time.perf_counter() - started:.1f}s; re-embedded: {', '.join(embedded) or 'none'}; "
+              f"reused: {', '.join(reused) or 'none'}")
+    else:
+        index = VectorIndex(INDEX_DIR)
+        started = time.perf_counter()
+        hits = index.search(args.query, top_k=args.k)
+        elapsed = (time.perf_counter() - started) * 1000
+        for score, document, page, text in hits:
+            print(f"{score:6.3f}  {document} p.{page}: {text[:160]}")
+        print(f"({elapsed:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()